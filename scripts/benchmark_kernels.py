@@ -0,0 +1,48 @@
+from timeit import timeit
+
+import numpy as np
+
+from stego.core import blocking
+from stego.core import kernels
+
+SUBBAND_SIZE = 2448 // 2**3
+BLOCK_SIZE = 5
+REPEATS = 50
+
+
+def nanmean_margins(cover: np.ndarray, block_size: int) -> np.ndarray:
+    """Reference implementation of the previous decode_blocks statistics."""
+    blocks = np.array(blocking.divide_image(cover, block_size))
+    center_index = block_size // 2
+    center_values = blocks[:, center_index, center_index].copy()
+    blocks[:, center_index, center_index] = np.nan
+    return center_values - np.nanmean(blocks, axis=(1, 2))
+
+
+def kernel_margins(cover: np.ndarray, block_size: int) -> np.ndarray:
+    sums, centers = kernels.block_statistics(blocking.block_view(cover, block_size))
+    return kernels.center_margins(sums, centers, block_size).reshape(-1)
+
+
+def benchmark(dtype: type):
+    rng = np.random.default_rng(0)
+    cover = rng.normal(0, 20, (SUBBAND_SIZE, SUBBAND_SIZE)).astype(dtype)
+
+    reference = nanmean_margins(cover, BLOCK_SIZE)
+    result = kernel_margins(cover, BLOCK_SIZE)
+    tolerance = 1e-3 if dtype == np.float32 else 1e-9
+    assert np.allclose(reference, result, atol=tolerance)
+
+    nanmean_time = timeit(lambda: nanmean_margins(cover, BLOCK_SIZE), number=REPEATS)
+    kernel_time = timeit(lambda: kernel_margins(cover, BLOCK_SIZE), number=REPEATS)
+
+    print(
+        f"{np.dtype(dtype).name}: nanmean {nanmean_time / REPEATS * 1e3:.3f} ms, "
+        f"kernel {kernel_time / REPEATS * 1e3:.3f} ms, "
+        f"speedup {nanmean_time / kernel_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    for dtype in [np.float64, np.float32]:
+        benchmark(dtype)
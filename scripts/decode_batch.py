@@ -37,7 +37,7 @@ def decode_batch(size, file_size):
             )
             psnr = metrics.peak_signal_noise_ratio(stego_img, matched_size_processed)
 
-            message, ecc_message, message_raw = utils.decode(
+            message, ecc_message, decoded_size = utils.decode_rescaled(
                 processed_img, encoder_config
             )
             print(message)
@@ -59,7 +59,7 @@ def decode_batch(size, file_size):
                 "size": processed_img.shape[0],
                 "size_original": size,
                 "psnr": psnr,
-                "resized": False,
+                "resized": decoded_size != processed_img.shape[:2],
             }
 
             results.append(result)
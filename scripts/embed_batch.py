@@ -40,7 +40,9 @@ def embed_batch(size):
 
             info |= encoder_config
 
-            info |= metrics.diff_metrics(original, stego_image)
+            info |= metrics.diff_metrics(
+                original, stego_image, encoder_config["precision"]
+            )
 
             measurements.append(info)
 
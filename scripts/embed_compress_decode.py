@@ -54,7 +54,7 @@ def encode_compress_decode(encoder_config, img_dir_path, file_name):
         decoded_results[f"{quality}_is_success"] = is_success
         decoded_results[f"{quality}_is_false_positive"] = is_false_positive
 
-    info |= metrics.diff_metrics(original, stego_image)
+    info |= metrics.diff_metrics(original, stego_image, encoder_config["precision"])
 
     info |= decoded_results
 
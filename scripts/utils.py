@@ -5,6 +5,7 @@ import cv2
 import numpy as np
 
 from stego.core import multichannel_coder
+from stego.core import rescale
 
 
 def resize_image_with_aspect_ratio(img, new_width: int):
@@ -65,6 +66,17 @@ def decode(img, parameters):
     return message, ecc_message, message_raw
 
 
+def decode_rescaled(img, parameters):
+    if parameters.get("wavelet", "haar") != "haar":
+        message, ecc_message, _ = decode(img, parameters)
+        return message, ecc_message, img.shape[:2]
+    message, ecc_message, size = rescale.decode_color_image(img, **parameters)
+    if message is not None:
+        message = message.decode("ASCII", errors="replace")
+
+    return message, ecc_message, size
+
+
 def compress_image(image, quality):
     encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
     result, encimg = cv2.imencode(".jpg", image, encode_param)
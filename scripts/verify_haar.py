@@ -0,0 +1,116 @@
+from pathlib import Path
+from timeit import timeit
+
+import cv2
+import numpy as np
+import pywt
+
+from stego import config
+from stego.core import blocking
+from stego.core import coder
+from stego.core import haar
+from stego.core import kernels
+
+COEFFICIENTS = ["ad", "da", "dd"]
+REPEATS = 5
+
+
+def check_detail_bands(image: np.ndarray, level: int):
+    """Compares the closed-form bands with pywt on all complete pixel blocks."""
+    decomposition = pywt.wavedecn(image, wavelet="haar", level=level)
+    bands = haar.detail_bands(image, level, COEFFICIENTS)
+    for coefficient in COEFFICIENTS:
+        band = bands[coefficient]
+        expected = decomposition[1][coefficient][: band.shape[0], : band.shape[1]]
+        assert np.allclose(band, expected, atol=1e-9), (image.shape, level, coefficient)
+
+
+def block_margins(cover: np.ndarray, block_size: int) -> np.ndarray:
+    sums, centers = kernels.block_statistics(blocking.block_view(cover, block_size))
+    return kernels.center_margins(sums, centers, block_size)
+
+
+def check_decode(image: np.ndarray, parameters: dict):
+    """Compares the block margins decoded by the fast path and the pywt path.
+
+    Bits are not compared directly: margins that are exactly zero in one path
+    may come out as +/-1e-13 in the other.
+    """
+    decomposition = pywt.wavedecn(image, wavelet="haar", level=parameters["level"])
+    bands = coder.detail_bands(image, **parameters)
+    for coefficient in parameters["coefficients"]:
+        expected = block_margins(
+            decomposition[1][coefficient], parameters["block_size"]
+        )
+        result = block_margins(bands[coefficient], parameters["block_size"])
+        assert np.allclose(result, expected, atol=1e-9), coefficient
+
+
+def encode_pywt(image: np.ndarray, message_parts: list[bytes], parameters: dict):
+    """Reference encoder going through wavedecn and waverecn."""
+    level = parameters["level"]
+    decomposition = pywt.wavedecn(image, wavelet="haar", level=level)
+    for coefficient, message in zip(parameters["coefficients"], message_parts):
+        coder.embed_centers(
+            message,
+            decomposition[1][coefficient],
+            parameters["block_size"],
+            2**level,
+            parameters["alpha"],
+        )
+    return pywt.waverecn(decomposition, wavelet="haar")
+
+
+def check_encode(image: np.ndarray, parameters: dict):
+    """Compares the pixel-domain encoder with the wavedecn/waverecn path."""
+    image, _ = blocking.crop_image_to_divisible(
+        image, parameters["block_size"] * 2 ** parameters["level"]
+    )
+    message_parts = coder.message_dispatcher(image, b"Lorem ipsum", **parameters)
+    expected = encode_pywt(image, message_parts, parameters)
+    result = coder.encode_haar(image, message_parts, **parameters)
+    assert np.allclose(result, expected, atol=1e-9)
+
+    megapixels = image.size / 1e6
+    pywt_time = timeit(
+        lambda: encode_pywt(image, message_parts, parameters), number=REPEATS
+    )
+    haar_time = timeit(
+        lambda: coder.encode_haar(image, message_parts, **parameters), number=REPEATS
+    )
+    print(
+        f"encode: pywt {REPEATS * megapixels / pywt_time:.1f} MP/s, "
+        f"closed-form {REPEATS * megapixels / haar_time:.1f} MP/s"
+    )
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for height, width in [(64, 64), (97, 131), (250, 333)]:
+        image = rng.integers(0, 256, (height, width), dtype=np.uint8)
+        for level in range(1, 5):
+            check_detail_bands(image, level)
+
+    img_path = sorted(Path(config.get_images_dir()).glob("*.png"))[0]
+    image = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
+    parameters = config.get_encoder_config()
+    check_decode(image, parameters)
+    check_encode(image, parameters)
+
+    pywt_time = timeit(
+        lambda: pywt.wavedecn(image, wavelet="haar", level=parameters["level"]),
+        number=REPEATS,
+    )
+    haar_time = timeit(
+        lambda: haar.detail_bands(image, parameters["level"], COEFFICIENTS),
+        number=REPEATS,
+    )
+    print(
+        f"decode: wavedecn {pywt_time / REPEATS * 1e3:.1f} ms, "
+        f"closed-form {haar_time / REPEATS * 1e3:.1f} ms"
+    )
+    print("Haar fast path matches pywt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import cv2
+
+from scripts import utils
+from scripts.embed_batch import SECRET
+from stego import config
+from stego.core import metrics
+
+PSNR_TOLERANCE = 0.01
+
+
+def encode_and_decode(img, parameters: dict) -> dict:
+    original, stego_image, _ = utils.embed(img, SECRET, parameters)
+    message, _, _ = utils.decode(stego_image, parameters)
+    compressed_message, _, _ = utils.decode(
+        utils.compress_image(stego_image, 75), parameters
+    )
+    return {
+        "psnr": metrics.diff_metrics(original, stego_image, parameters["precision"])[
+            "psnr"
+        ],
+        "is_success": message == SECRET,
+        "is_success_jpg_75": compressed_message == SECRET,
+    }
+
+
+def main():
+    img_path = sorted(Path(config.get_images_dir()).glob("*.png"))[0]
+    img = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
+
+    for wavelet in ["haar", "db2"]:
+        results = {}
+        for precision in ["float64", "float32"]:
+            parameters = config.get_encoder_config() | {
+                "wavelet": wavelet,
+                "precision": precision,
+            }
+            results[precision] = encode_and_decode(img, parameters)
+            print(wavelet, precision, results[precision])
+
+        reference, result = results["float64"], results["float32"]
+        assert result["is_success"] == reference["is_success"]
+        assert result["is_success_jpg_75"] == reference["is_success_jpg_75"]
+        assert abs(result["psnr"] - reference["psnr"]) < PSNR_TOLERANCE
+
+    print("float32 results match float64")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,22 +15,27 @@ def get_new_shape(img: np.ndarray, block_size: int) -> tuple[int, int]:
     return new_height, new_width
 
 
-def divide_image(img: np.ndarray, block_size: int = 8) -> list[np.ndarray]:
-    height, width = img.shape[:2]
-    blocks_wide = width // block_size
-    blocks_high = height // block_size
-    blocks = []
+def block_view(img: np.ndarray, block_size: int) -> np.ndarray:
+    """Returns a (blocks_high, blocks_wide, block_size, block_size) strided view.
+
+    Trailing axes of ``img`` (e.g. channels) are kept after the block axes.
+    Writing to the view modifies ``img``; incomplete blocks at the bottom and
+    right edges are left out, as in ``divide_image``.
+    """
+    blocks_high = img.shape[0] // block_size
+    blocks_wide = img.shape[1] // block_size
+    stride_y, stride_x = img.strides[:2]
+    return np.lib.stride_tricks.as_strided(
+        img,
+        shape=(blocks_high, blocks_wide, block_size, block_size) + img.shape[2:],
+        strides=(stride_y * block_size, stride_x * block_size, stride_y, stride_x)
+        + img.strides[2:],
+    )
 
-    for i in range(blocks_high):
-        for j in range(blocks_wide):
-            start_y = i * block_size
-            end_y = (i + 1) * block_size
-            start_x = j * block_size
-            end_x = (j + 1) * block_size
-            block = img[start_y:end_y, start_x:end_x]
-            blocks.append(block)
 
-    return blocks
+def divide_image(img: np.ndarray, block_size: int = 8) -> list[np.ndarray]:
+    blocks = block_view(img, block_size)
+    return [block for row in blocks for block in row]
 
 
 def merge_blocks(blocks: list[np.ndarray], img_shape: tuple) -> np.ndarray:
@@ -39,15 +44,9 @@ def merge_blocks(blocks: list[np.ndarray], img_shape: tuple) -> np.ndarray:
     blocks_high = img_shape[0] // block_size
     merged_img = np.zeros(img_shape, dtype=blocks[0].dtype)
 
-    block_idx = 0
-    for i in range(blocks_high):
-        for j in range(blocks_wide):
-            start_y = i * block_size
-            end_y = (i + 1) * block_size
-            start_x = j * block_size
-            end_x = (j + 1) * block_size
-            merged_img[start_y:end_y, start_x:end_x] = blocks[block_idx]
-            block_idx += 1
+    block_view(merged_img, block_size)[:] = np.reshape(
+        blocks, (blocks_high, blocks_wide) + blocks[0].shape
+    )
 
     return merged_img
 
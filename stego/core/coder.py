@@ -1,68 +1,451 @@
+from functools import lru_cache
+
 import numpy as np
 import pywt
 
 import stego.core.message as msg_utils
 import stego.core.blocking as blocking
+import stego.core.haar as haar
+import stego.core.impulse as impulse
+import stego.core.kernels as kernels
+import stego.core.lifting as lifting
+import stego.core.parallel as parallel
 from stego.core.errors import CapacityError
 import logging
 
 BYTE = 8
 
 
+def _as_block_grid(blocks: list[np.ndarray] | np.ndarray) -> np.ndarray:
+    """Returns blocks as a (blocks_high, blocks_wide, bs, bs) array.
+
+    A block view is returned unchanged, a flat list of blocks is stacked into
+    a single row of blocks.
+    """
+    blocks = np.asarray(blocks)
+    if blocks.ndim == 3:
+        blocks = blocks[:, np.newaxis]
+    return blocks
+
+
 def modify_blocks(
-    message: bytes, blocks: list[np.ndarray], bit_step: int, alpha: float
+    message: bytes, blocks: list[np.ndarray] | np.ndarray, bit_step: int, alpha: float
 ) -> np.ndarray:
+    """Embeds the message into block centers, writing through to ``blocks``."""
     message_bin: np.ndarray = msg_utils.bytes_to_binary(message).astype(int)
-    blocks = np.array(blocks)
-    center_index = blocks.shape[1] // 2, blocks.shape[2] // 2
+    grid = _as_block_grid(blocks)
+    center_index = grid.shape[2] // 2
     mv = message_bin * bit_step * 2 - bit_step
-    mean_values = np.nanmean(blocks, axis=(1, 2))[: message_bin.size]
-    blocks[: message_bin.size, *center_index] = mean_values + alpha * mv
+    sums, _ = kernels.block_statistics(grid)
+    mean_values = kernels.block_means(sums, grid.shape[2]).reshape(-1)
+    mean_values = mean_values[: message_bin.size]
+    rows, cols = np.divmod(np.arange(mean_values.size), grid.shape[1])
+    grid[rows, cols, center_index, center_index] = mean_values + alpha * mv
 
-    return blocks
+    return grid.reshape(np.shape(blocks))
+
+
+@lru_cache
+def center_indices(
+    blocks_wide: int, block_size: int, count: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns subband (rows, cols) of the centers of the first ``count`` blocks.
 
+    The read-only gather tables are cached per block grid.
+    """
+    rows, cols = np.divmod(np.arange(count), blocks_wide)
+    center_index = block_size // 2
+    indices = rows * block_size + center_index, cols * block_size + center_index
+    for index in indices:
+        index.flags.writeable = False
+    return indices
 
-def decode_blocks(blocks: list[np.ndarray]) -> bytes:
-    blocks = np.array(blocks)
-    center_index = blocks.shape[1] // 2, blocks.shape[2] // 2
 
-    center_values = blocks[:, *center_index].copy()
-    blocks[:, *center_index] = np.nan
-    mean_values = np.nanmean(blocks, axis=(1, 2))
+def stack_bands(bands: dict[str, np.ndarray], coefficients: list[str]) -> np.ndarray:
+    """Stacks detail bands along a new last axis, in the order of ``coefficients``."""
+    return np.stack([bands[coefficient] for coefficient in coefficients], axis=-1)
+
+
+def stacked_bits(message_parts: list[bytes] | np.ndarray, ndim: int) -> np.ndarray:
+    """Returns the bits of equal-length parts, one part per band of a stack.
+
+    ``message_parts`` is a list of parts shared by all channels, or a
+    (..., parts, bytes) uint8 array whose leading axes match the trailing
+    axes of the stack, e.g. (images, 1, parts, bytes) for a batch. The
+    (bits, ..., parts) result broadcasts over the block grid of a
+    ``ndim``-dimensional stack from ``stack_bands``.
+    """
+    if not isinstance(message_parts, np.ndarray):
+        message_parts = np.stack(
+            [np.frombuffer(part, dtype=np.uint8) for part in message_parts]
+        )
+    bits = np.moveaxis(np.unpackbits(message_parts, axis=-1), -1, 0)
+    return bits.reshape(
+        (bits.shape[0],) + (1,) * (ndim - 1 - bits.ndim) + bits.shape[1:]
+    )
+
+
+def embed_bits(
+    bits: np.ndarray, cover: np.ndarray, block_size: int, bit_step: int, alpha: float
+) -> np.ndarray:
+    """Embeds bits by rewriting only the block centers of ``cover`` in place.
 
-    differences = center_values - mean_values
-    inferred_bits = differences > 0
+    ``cover`` may have trailing axes (channels, stacked bands); ``bits`` has
+    one row per block and broadcasts over them.
+    """
+    blocks = blocking.block_view(cover, block_size)
+    blocks_wide = blocks.shape[1]
+    bit_count = bits.shape[0]
+    used_rows = -(-bit_count // blocks_wide)
+    mv = bits.astype(int) * bit_step * 2 - bit_step
+    sums, _ = kernels.block_statistics(blocks[:used_rows])
+    mean_values = kernels.block_means(sums, block_size)
+    mean_values = mean_values.reshape((-1,) + sums.shape[2:])[:bit_count]
+    center_values = mean_values + alpha * mv
+    if np.issubdtype(cover.dtype, np.integer):
+        center_values = np.rint(center_values)
+    cover[center_indices(blocks_wide, block_size, bit_count)] = center_values
+
+    return cover
+
+
+def embed_bands(
+    bits: np.ndarray,
+    bands: np.ndarray,
+    block_size: int,
+    bit_step: int,
+    alpha: float,
+    workers: int = 1,
+) -> np.ndarray:
+    """Embeds stacked bits into a ``stack_bands`` stack, one band per task."""
+    if parallel.resolve_workers(workers) == 1:
+        return embed_bits(bits, bands, block_size, bit_step, alpha)
+
+    def embed_band(index: int) -> np.ndarray:
+        band_bits = bits[..., index : index + 1] if bits.shape[-1] > 1 else bits
+        return embed_bits(
+            band_bits, bands[..., index : index + 1], block_size, bit_step, alpha
+        )
+
+    parallel.map_ordered(embed_band, range(bands.shape[-1]), workers)
+    return bands
+
+
+def embed_centers(
+    message: bytes, cover: np.ndarray, block_size: int, bit_step: int, alpha: float
+) -> np.ndarray:
+    """Embeds the message by rewriting only the block centers of ``cover`` in place."""
+    message_bin = msg_utils.bytes_to_binary(message)
+    message_bin = message_bin.reshape((-1,) + (1,) * (cover.ndim - 2))
+    return embed_bits(message_bin, cover, block_size, bit_step, alpha)
+
+
+def block_margins(blocks: np.ndarray) -> np.ndarray:
+    """Returns (blocks, ...) differences between centers and the rest of blocks."""
+    sums, center_values = kernels.block_statistics(blocks)
+    differences = kernels.center_margins(sums, center_values, blocks.shape[2])
+    return differences.reshape((-1,) + differences.shape[2:])
+
+
+def decode_blocks(blocks: list[np.ndarray] | np.ndarray) -> bytes:
+    inferred_bits = block_margins(_as_block_grid(blocks)) > 0
 
     message = msg_utils.binary_to_bytes(inferred_bits)
     return message
 
 
+def splits_channels(image: np.ndarray, workers: int) -> bool:
+    """Checks that work can be split along the first trailing axis of an image."""
+    return (
+        parallel.resolve_workers(workers) > 1 and image.ndim > 2 and image.shape[2] > 1
+    )
+
+
+def channel_parts(
+    message_parts: list[bytes] | np.ndarray, ndim: int, chunk: slice
+) -> list[bytes] | np.ndarray:
+    """Returns the message parts of a slice of the first trailing image axis.
+
+    Parts shared by all channels are returned unchanged, see ``stacked_bits``
+    for how an array of parts lines up with a ``ndim``-dimensional image.
+    """
+    if not isinstance(message_parts, np.ndarray):
+        return message_parts
+    axis = message_parts.ndim - ndim
+    if axis < 0 or message_parts.shape[axis] == 1:
+        return message_parts
+    return message_parts[(slice(None),) * axis + (chunk,)]
+
+
 def encode(
     image: np.ndarray,
-    message_parts: list[bytes],
+    message_parts: list[bytes] | np.ndarray,
     *,
     coefficients: list[str],
     alpha: float = 1,
     block_size: int = 3,
     level: int = 2,
     wavelet: str = "haar",
+    precision: str = "float64",
+    workers: int = 1,
     **kwargs,
 ) -> np.ndarray:
-    bit_step = 2**level
-    decomposition = pywt.wavedecn(image, wavelet=wavelet, level=level)
-    for coefficient, message in zip(coefficients, message_parts):
-        cover = decomposition[1][coefficient]
-        blocks = blocking.divide_image(cover, block_size=block_size)
-        modified_blocks = modify_blocks(message, blocks, bit_step, alpha)
-        decomposition[1][coefficient] = blocking.merge_blocks(
-            modified_blocks, cover.shape
+    """Embeds one message part per band into an image.
+
+    ``image`` is (height, width) or (height, width, ...), e.g. with channels;
+    all trailing axes are transformed together. A list of parts is shared by
+    all of them, see ``stacked_bits`` for per-image parts. With several
+    ``workers``, channels are encoded in threads, or bands of a single
+    channel are embedded in threads.
+    """
+    parameters = {
+        "coefficients": coefficients,
+        "alpha": alpha,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "precision": precision,
+    }
+    if splits_channels(image, workers):
+        chunks = parallel.chunk_slices(image.shape[2], workers)
+        stego_chunks = parallel.map_ordered(
+            lambda chunk: encode(
+                image[:, :, chunk],
+                channel_parts(message_parts, image.ndim, chunk),
+                **parameters,
+            ),
+            chunks,
+            workers,
         )
+        return np.concatenate(stego_chunks, axis=2)
+
+    if wavelet == "haar" and haar.divides(image.shape, level):
+        stego = encode_haar(
+            image,
+            message_parts,
+            coefficients=coefficients,
+            alpha=alpha,
+            block_size=block_size,
+            level=level,
+            precision=precision,
+            workers=workers,
+        )
+    elif (
+        wavelet != lifting.WAVELET
+        and haar.divides(image.shape, level)
+        and impulse.is_compact(wavelet, level, block_size, tuple(coefficients))
+    ):
+        stego = encode_sparse(
+            image,
+            message_parts,
+            coefficients=coefficients,
+            alpha=alpha,
+            block_size=block_size,
+            level=level,
+            wavelet=wavelet,
+            precision=precision,
+            workers=workers,
+        )
+    else:
+        if wavelet == lifting.WAVELET:
+            bit_step = lifting.BIT_STEP
+            decomposition = lifting.wavedecn(image, level)
+        else:
+            bit_step = 2**level
+            decomposition = pywt.wavedecn(
+                image.astype(precision), wavelet=wavelet, level=level, axes=(0, 1)
+            )
+        bands = stack_bands(decomposition[1], coefficients)
+        bits = stacked_bits(message_parts, bands.ndim)
+        embed_bands(bits, bands, block_size, bit_step, alpha, workers)
+        for index, coefficient in enumerate(coefficients):
+            decomposition[1][coefficient] = bands[..., index]
+
+        if wavelet == lifting.WAVELET:
+            stego = lifting.waverecn(decomposition)
+        else:
+            stego = pywt.waverecn(decomposition, wavelet=wavelet, axes=(0, 1))
 
-    stego = pywt.waverecn(decomposition, wavelet=wavelet)
     stego = np.clip(stego, 0, 255).astype(np.uint8)
     return stego
 
 
+def encode_haar(
+    image: np.ndarray,
+    message_parts: list[bytes] | np.ndarray,
+    *,
+    coefficients: list[str],
+    alpha: float = 1,
+    block_size: int = 3,
+    level: int = 2,
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> np.ndarray:
+    """Embeds in the pixel domain, without a full wavelet transform.
+
+    The detail bands are computed in closed form, and the change of every
+    center coefficient is added to its pixel block directly. The sides of
+    ``image`` must be divisible by 2**level.
+    """
+    return embed_haar_bits(
+        image,
+        stacked_bits(message_parts, image.ndim + 1),
+        coefficients=coefficients,
+        alpha=alpha,
+        block_size=block_size,
+        level=level,
+        precision=precision,
+        workers=workers,
+    )
+
+
+def embed_haar_bits(
+    image: np.ndarray,
+    bits: np.ndarray,
+    *,
+    coefficients: list[str],
+    alpha: float = 1,
+    block_size: int = 3,
+    level: int = 2,
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> np.ndarray:
+    """Embeds ``stacked_bits`` into the first blocks of an image, see ``encode_haar``.
+
+    Returns the unclipped float image.
+    """
+    bit_step = 2**level
+    stego = image.astype(precision, order="C")
+    bands = stack_bands(
+        haar.detail_bands(stego, level, coefficients, stego.dtype.type), coefficients
+    )
+    indices = center_indices(bands.shape[1] // block_size, block_size, bits.shape[0])
+    original_centers = bands[indices]
+    embed_bands(bits, bands, block_size, bit_step, alpha, workers)
+    deltas = bands[indices] - original_centers
+    for index, coefficient in enumerate(coefficients):
+        haar.add_coefficient_deltas(
+            stego, level, coefficient, indices, deltas[..., index]
+        )
+    return stego
+
+
+def encode_sparse(
+    image: np.ndarray,
+    message_parts: list[bytes] | np.ndarray,
+    *,
+    coefficients: list[str],
+    alpha: float = 1,
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> np.ndarray:
+    """Embeds by adding the responses of the changed centers to the cover.
+
+    Only the forward transform is computed; instead of ``pywt.waverecn`` the
+    cached impulse response of every changed center coefficient is added to
+    the image. The sides of ``image`` must be divisible by 2**level.
+    """
+    bit_step = 2**level
+    center_index = block_size // 2
+    stego = image.astype(precision)
+    decomposition = pywt.wavedecn(stego, wavelet=wavelet, level=level, axes=(0, 1))
+    bands = stack_bands(decomposition[1], coefficients)
+    centers = blocking.block_view(bands, block_size)[:, :, center_index, center_index]
+    original_centers = centers.copy()
+    embed_bands(
+        stacked_bits(message_parts, bands.ndim),
+        bands,
+        block_size,
+        bit_step,
+        alpha,
+        workers,
+    )
+    deltas = centers - original_centers
+    return impulse.add_center_responses(
+        stego,
+        level,
+        wavelet,
+        block_size,
+        {
+            coefficient: deltas[..., index]
+            for index, coefficient in enumerate(coefficients)
+        },
+    )
+
+
+def detail_bands(
+    image: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    precision: str = "float64",
+    **kwargs,
+) -> dict[str, np.ndarray]:
+    """Returns the coarsest detail bands used for embedding."""
+    dtype = np.dtype(precision).type
+    if wavelet == "haar" and haar.supports(image.shape, level, block_size):
+        return haar.detail_bands(image, level, coefficients, dtype)
+    if wavelet == lifting.WAVELET:
+        decomposition = lifting.wavedecn(image, level)
+    else:
+        decomposition = pywt.wavedecn(
+            image.astype(dtype), wavelet=wavelet, level=level, axes=(0, 1)
+        )
+    return {coefficient: decomposition[1][coefficient] for coefficient in coefficients}
+
+
+def extract_margins(
+    image: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> np.ndarray:
+    """Returns (blocks, ..., bands) block margins of an image.
+
+    Trailing axes of ``image`` are kept between the block and band axes. With
+    several ``workers``, channels, or bands of a single channel, are measured
+    in threads.
+    """
+    parameters = {
+        "coefficients": coefficients,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "precision": precision,
+    }
+    if splits_channels(image, workers):
+        margin_chunks = parallel.map_ordered(
+            lambda chunk: extract_margins(image[:, :, chunk], **parameters),
+            parallel.chunk_slices(image.shape[2], workers),
+            workers,
+        )
+        return np.concatenate(margin_chunks, axis=1)
+
+    bands = stack_bands(detail_bands(image, **parameters), coefficients)
+    blocks = blocking.block_view(bands, block_size)
+    if parallel.resolve_workers(workers) == 1:
+        return block_margins(blocks)
+    band_margins = parallel.map_ordered(
+        lambda index: block_margins(blocks[..., index : index + 1]),
+        range(bands.shape[-1]),
+        workers,
+    )
+    return np.concatenate(band_margins, axis=-1)
+
+
 def decode(
     image: np.ndarray,
     *,
@@ -70,19 +453,66 @@ def decode(
     block_size: int = 3,
     level: int = 2,
     wavelet: str = "haar",
+    precision: str = "float64",
+    workers: int = 1,
     **kwargs,
 ) -> list[bytes]:
-    decomposition = pywt.wavedecn(image, wavelet=wavelet, level=level)
-    message_parts = []
-    for coefficient in coefficients:
-        cover = decomposition[1][coefficient]
-        blocks = blocking.divide_image(cover, block_size=block_size)
-        message = decode_blocks(blocks)
-        message_parts.append(message)
+    """Extracts one message part per band, and per channel of a 3-D image.
+
+    Parts are ordered by channel first, then by band.
+    """
+    margins = extract_margins(
+        image,
+        coefficients=coefficients,
+        block_size=block_size,
+        level=level,
+        wavelet=wavelet,
+        precision=precision,
+        workers=workers,
+    )
+    inferred_bits = margins.reshape(margins.shape[0], -1) > 0
+    message_parts = [
+        msg_utils.binary_to_bytes(part_bits) for part_bits in inferred_bits.T
+    ]
     logging.debug(f"Message parts: {message_parts}")
     return message_parts
 
 
+def band_weights(margins: np.ndarray) -> np.ndarray:
+    """Returns the reliability A / sigma**2 of every channel and band.
+
+    ``margins`` is (bits, ..., bands). Embedded margins are +/-A plus noise,
+    so the mean magnitude estimates A and the variance of the magnitudes
+    estimates the noise power.
+    """
+    magnitudes = np.abs(margins)
+    amplitude = magnitudes.mean(axis=0)
+    variance = magnitudes.var(axis=0)
+    return amplitude / np.maximum(variance, np.finfo(variance.dtype).tiny)
+
+
+def soft_payload(margins: np.ndarray, coefficient_capacity: int) -> np.ndarray:
+    """Returns weighted margins in the bit order of the dispatched payload.
+
+    ``margins`` is (blocks, ..., bands) from ``extract_margins``; the result
+    is (..., bits), one copy of the payload per channel, with the bits of
+    ``message_consolidator`` and ``band_weights`` applied. Positive values
+    are ones.
+    """
+    used = margins[: coefficient_capacity * BYTE]
+    weighted = used * band_weights(used)
+    weighted = np.moveaxis(weighted, 0, -1)
+    return weighted.reshape(weighted.shape[:-2] + (-1,))
+
+
+def band_soft_bits(
+    band: np.ndarray, block_size: int, coefficient_capacity: int
+) -> np.ndarray:
+    """Returns the weighted margins of one 2-D band, see ``soft_payload``."""
+    margins = block_margins(blocking.block_view(band, block_size))
+    return soft_payload(margins[:, np.newaxis], coefficient_capacity)
+
+
 def get_capacity(
     image: np.ndarray,
     *,
@@ -95,7 +525,7 @@ def get_capacity(
     initial_block_size = block_size * 2**level
     height, width = image.shape[:2]
     coefficient_capacity = (
-        height // initial_block_size * width // initial_block_size
+        (height // initial_block_size) * (width // initial_block_size)
     ) // BYTE
     image_capacity = coefficient_capacity * len(coefficients)
     return image_capacity, coefficient_capacity
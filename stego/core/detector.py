@@ -0,0 +1,154 @@
+import numpy as np
+from scipy import stats
+
+from stego.core import blocking
+from stego.core import coder
+from stego.core import lifting
+from stego.core import multichannel_coder
+
+DEFAULT_FALSE_POSITIVE_RATE = 1e-3
+
+# Side, in pixels, of the top-left window that is scored. The payload
+# repeats over the whole image, so larger windows only cost time.
+WINDOW = 1024
+
+
+def center_ranks(blocks: np.ndarray, amplitude: float) -> np.ndarray:
+    """Returns how close the margin of every block center is to ``amplitude``.
+
+    The margin of a position is its difference from the mean of the rest of
+    its block. Positions are ranked by how far their absolute margin is from
+    ``amplitude``, farthest first, from 0 to ``block_size**2 - 1``, ties
+    counting half; the rank of the center is returned. ``blocks`` is a
+    (blocks_high, blocks_wide, bs, bs, ...) block view.
+    """
+    block_size = blocks.shape[2]
+    center = block_size // 2
+    sums = blocks.sum(axis=(2, 3), keepdims=True)
+    margins = blocks - (sums - blocks) / (block_size**2 - 1)
+    distances = np.abs(np.abs(margins) - amplitude)
+    center_distances = distances[:, :, center : center + 1, center : center + 1]
+    above = (distances > center_distances).sum(axis=(2, 3))
+    ties = (distances == center_distances).sum(axis=(2, 3)) - 1
+    return above + ties / 2
+
+
+def reference_offsets(block_size: int) -> list[tuple[int, int]]:
+    """Returns the (rows, columns) shifts of grids compared to the embedding grid."""
+    half = block_size // 2
+    return [(0, half), (half, 0), (half, half)]
+
+
+def row_rank_sums(
+    bands: np.ndarray, block_size: int, amplitude: float, offset: tuple[int, int]
+) -> np.ndarray:
+    """Returns the (block rows, ...) center rank sums of a shifted block grid.
+
+    The grid leaves out the last block row and column, so every offset of
+    ``reference_offsets`` covers as many blocks.
+    """
+    rows = bands.shape[0] // block_size - 1
+    cols = bands.shape[1] // block_size - 1
+    top, left = offset
+    shifted = bands[top : top + rows * block_size, left : left + cols * block_size]
+    ranks = center_ranks(blocking.block_view(shifted, block_size), amplitude)
+    # Sum over the blocks of a row and over the bands.
+    return ranks.sum(axis=(1, -1))
+
+
+def threshold(
+    rows: int, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE
+) -> float:
+    """Returns the score above which an unmarked image has the given probability.
+
+    ``rows`` is the number of block rows the score was computed from.
+    """
+    return stats.t.ppf(1 - false_positive_rate, rows - 1)
+
+
+def detection_scores(
+    images: np.ndarray,
+    *,
+    coefficients: list[str],
+    alpha: float = 1,
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    precision: str = "float64",
+    **kwargs,
+) -> tuple[np.ndarray, int]:
+    """Returns how strongly each image of a stack, or one image, looks marked.
+
+    ``images`` is (images, height, width, 3) or a single image. Only the
+    first band of the first used channel of the top-left ``WINDOW`` is
+    transformed. Embedding sets the margin of every block center close to
+    ``alpha * bit_step``, whether the content is smooth or textured, so
+    centers rank closer to it than other positions do. Unmarked images rank
+    centers differently from other positions too, as the center is
+    surrounded by its block, so the center ranks of the embedding grid are
+    compared to those of grids shifted by half a block, which content treats
+    alike. The score is the t statistic of the differences of the rank sums
+    of every block row, which also accounts for blocks of a row varying
+    together. Returns the scores and the number of block rows, see
+    ``threshold``.
+    """
+    single = images.ndim == 3
+    if single:
+        images = images[np.newaxis]
+    unit = block_size * 2**level
+    height, width = (
+        min(length, max(WINDOW // unit, 1) * unit)
+        for length in blocking.get_new_shape(images[0], unit)
+    )
+    bit_step = lifting.BIT_STEP if wavelet == lifting.WAVELET else 2**level
+    amplitude = alpha * bit_step
+
+    channels = np.stack(
+        [
+            multichannel_coder.rgb_to_color_space(
+                np.ascontiguousarray(image[:height, :width]), color_space
+            )[:, :, use_channels[0]]
+            for image in images
+        ],
+        axis=-1,
+    )
+    bands = coder.stack_bands(
+        coder.detail_bands(
+            channels,
+            coefficients=coefficients[:1],
+            block_size=block_size,
+            level=level,
+            wavelet=wavelet,
+            precision=precision,
+        ),
+        coefficients[:1],
+    )
+    offsets = reference_offsets(block_size)
+    references = sum(
+        row_rank_sums(bands, block_size, amplitude, offset) for offset in offsets
+    )
+    differences = row_rank_sums(
+        bands, block_size, amplitude, (0, 0)
+    ) - references / len(offsets)
+
+    rows = len(differences)
+    errors = differences.std(axis=0, ddof=1) / np.sqrt(rows)
+    scores = differences.mean(axis=0) / np.maximum(errors, np.finfo(float).tiny)
+    return (scores[0] if single else scores), rows
+
+
+def detect(
+    images: np.ndarray,
+    *,
+    false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+    **parameters,
+) -> np.ndarray:
+    """Returns whether each image, or a single image, carries a watermark.
+
+    Unmarked images are reported as marked with about ``false_positive_rate``.
+    Takes the keys of the ``[encoder]`` config, see ``detection_scores``.
+    """
+    scores, rows = detection_scores(images, **parameters)
+    return scores > threshold(rows, false_positive_rate)
@@ -1,3 +1,8 @@
 class CapacityError(Exception):
     """Raised when the capacity of the image is not sufficient for the message."""
     pass
+
+
+class ConfigError(Exception):
+    """Raised when encoder parameters are invalid."""
+    pass
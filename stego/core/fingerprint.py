@@ -0,0 +1,137 @@
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from stego.core import blocking
+from stego.core import coder
+from stego.core import haar
+from stego.core import kernels
+from stego.core.plan import EncoderPlan
+
+
+class FingerprintSession:
+    """Encodes many messages into one cover, sharing all message-independent work.
+
+    Takes the cover and the keys of the ``[encoder]`` config. With Haar, the
+    crop, color conversion, detail bands and block means are computed once,
+    and so is the converted cover, since embedding only changes the pixel
+    blocks of the used block centers. Every message then costs its error
+    correction plus the conversion of those blocks, a fraction of the image.
+    Other wavelets encode every message with an ``EncoderPlan``. The stego
+    images equal those of ``encode_color_image``.
+    """
+
+    def __init__(self, cover: np.ndarray, **parameters):
+        self.plan = EncoderPlan(**parameters)
+        self.layout = self.plan.layout(cover.shape)
+        self.image = cover[: self.layout.height, : self.layout.width]
+        parameters = self.plan.parameters
+        self.sparse = parameters["wavelet"] == "haar"
+        if not self.sparse:
+            return
+
+        level = parameters["level"]
+        block_size = parameters["block_size"]
+        self.size = 2**level
+        bit_count = self.layout.coefficient_capacity * coder.BYTE
+        channels = self.plan.convert(self.image, self.plan.to_color_space)
+        selected = channels[:, :, self.plan.use_channels].astype(
+            parameters["precision"], order="C"
+        )
+        bands = coder.stack_bands(
+            haar.detail_bands(
+                selected, level, parameters["coefficients"], selected.dtype.type
+            ),
+            parameters["coefficients"],
+        )
+        blocks = blocking.block_view(bands, block_size)
+        used_rows = -(-bit_count // blocks.shape[1])
+        sums, _ = kernels.block_statistics(blocks[:used_rows])
+        self.means = kernels.block_means(sums, block_size).reshape(
+            (-1,) + sums.shape[2:]
+        )[:bit_count]
+        self.centers = bands[self.layout.indices]
+
+        # Pixel blocks of the used centers, as a (blocks * size, size) strip
+        # that the Haar helpers treat as an image one block wide.
+        self.block_indices = self.layout.indices
+        self.pixels = self._gather(selected)
+        self.channel_pixels = self._gather(channels)
+        self.strip_indices = np.arange(bit_count), np.zeros(bit_count, dtype=int)
+        self.stego = self.plan.convert(channels, self.plan.to_rgb)
+
+    def _gather(self, image: np.ndarray) -> np.ndarray:
+        size = self.size
+        rows, cols = self.block_indices
+        blocks = image.reshape(
+            (image.shape[0] // size, size, image.shape[1] // size, size)
+            + image.shape[2:]
+        )
+        return blocks[rows, :, cols].reshape((-1, size) + image.shape[2:])
+
+    def payload(self, message: bytes) -> np.ndarray:
+        """Returns the (bands, bytes) dispatched ECC payload of a message.
+
+        Unlike ``EncoderPlan.payload`` it is not cached, as every recipient
+        has its own message.
+        """
+        ecc_message = self.plan.codec.encode(message)
+        parts = coder.message_dispatcher(
+            np.empty((self.layout.height, self.layout.width, 0)),
+            ecc_message,
+            **self.plan.parameters,
+        )
+        return np.stack([np.frombuffer(part, dtype=np.uint8) for part in parts])
+
+    def encode(self, message: bytes) -> np.ndarray:
+        """Returns the cover with a message embedded, as an RGB image."""
+        if not self.sparse:
+            return self.plan.encode(self.image, message)[1]
+
+        parameters = self.plan.parameters
+        bits = coder.stacked_bits(self.payload(message), self.centers.ndim + 1)
+        bit_step = 2 ** parameters["level"]
+        mv = bits.astype(int) * bit_step * 2 - bit_step
+        centers = (self.means + parameters["alpha"] * mv).astype(self.centers.dtype)
+        deltas = centers - self.centers
+
+        pixels = self.pixels.copy()
+        for index, coefficient in enumerate(parameters["coefficients"]):
+            haar.add_coefficient_deltas(
+                pixels,
+                parameters["level"],
+                coefficient,
+                self.strip_indices,
+                deltas[..., index],
+            )
+        channel_pixels = self.channel_pixels.copy()
+        channel_pixels[:, :, self.plan.use_channels] = np.clip(pixels, 0, 255).astype(
+            np.uint8
+        )
+        stego_pixels = self.plan.convert(channel_pixels, self.plan.to_rgb)
+
+        stego = self.stego.copy()
+        size = self.size
+        blocks = stego.reshape(
+            (stego.shape[0] // size, size, stego.shape[1] // size, size, 3)
+        )
+        rows, cols = self.block_indices
+        blocks[rows, :, cols] = stego_pixels.reshape((-1, size, size, 3))
+        return stego
+
+    def variants(self, messages: Iterable[bytes]) -> Iterator[np.ndarray]:
+        """Yields the stego image of every message, one at a time."""
+        for message in messages:
+            yield self.encode(message)
+
+    def save(
+        self, messages: Iterable[bytes], paths: Iterable[str | Path], *params: int
+    ) -> None:
+        """Writes the stego image of every message to its path with ``cv2.imwrite``.
+
+        ``params`` are passed on to ``cv2.imwrite``, e.g. a JPEG quality.
+        """
+        for stego, path in zip(self.variants(messages), paths):
+            cv2.imwrite(str(path), cv2.cvtColor(stego, cv2.COLOR_RGB2BGR), list(params))
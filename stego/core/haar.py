@@ -0,0 +1,110 @@
+import cv2
+import numpy as np
+
+# Signs of the (top, bottom) x (left, right) quadrants of a 2**level x 2**level
+# pixel block in the level detail coefficient computed by pywt for "haar".
+QUADRANT_SIGNS = {
+    "ad": np.array([[1, -1], [1, -1]]),
+    "da": np.array([[1, 1], [-1, -1]]),
+    "dd": np.array([[1, -1], [-1, 1]]),
+}
+
+# Most channels cv2.resize accepts in one (height, width, channels) image.
+MAX_CHANNELS = 512
+
+
+def quadrant_sums(
+    image: np.ndarray, level: int, dtype: type = np.float64
+) -> np.ndarray:
+    """Returns (height, 2, width, 2, ...) quadrant sums of 2**level pixel blocks.
+
+    Area interpolation by an integer factor averages every quadrant, and
+    scaling by a power of two turns the averages back into sums.
+    """
+    size = 2**level
+    half = size // 2
+    height, width = image.shape[0] // size, image.shape[1] // size
+    pixels = image[: height * size, : width * size]
+    channels = int(np.prod(image.shape[2:], dtype=int))
+    if channels > MAX_CHANNELS or pixels.size == 0:
+        blocks = pixels.reshape((height, 2, half, width, 2, half) + image.shape[2:])
+        return blocks.sum(axis=(2, 5), dtype=dtype)
+
+    pixels = np.ascontiguousarray(pixels, dtype=dtype).reshape(
+        pixels.shape[:2] + (channels,)
+    )
+    means = cv2.resize(pixels, (2 * width, 2 * height), interpolation=cv2.INTER_AREA)
+    sums = means.reshape((height, 2, width, 2) + image.shape[2:])
+    sums *= dtype(half**2)
+    return sums
+
+
+def detail_bands(
+    image: np.ndarray, level: int, coefficients: list[str], dtype: type = np.float64
+) -> dict[str, np.ndarray]:
+    """Computes the level detail bands of a Haar decomposition in closed form.
+
+    Every detail coefficient is a signed sum of the quadrants of a
+    2**level x 2**level pixel block, so no intermediate levels are computed.
+    The bands cover only complete pixel blocks.
+    """
+    quadrants = quadrant_sums(image, level, dtype) / dtype(2**level)
+    return combine_quadrants(quadrants, coefficients)
+
+
+def combine_quadrants(
+    quadrants: np.ndarray, coefficients: list[str]
+) -> dict[str, np.ndarray]:
+    """Returns the detail bands of (height, 2, width, 2, ...) scaled quadrant sums."""
+    bands = {}
+    for coefficient in coefficients:
+        signs = QUADRANT_SIGNS[coefficient]
+        bands[coefficient] = sum(
+            int(signs[row, col]) * quadrants[:, row, :, col]
+            for row in range(2)
+            for col in range(2)
+        )
+    return bands
+
+
+def supports(shape: tuple, level: int, block_size: int) -> bool:
+    """Checks that closed-form bands yield the same blocks as ``pywt.wavedecn``.
+
+    pywt pads odd lengths, so its subbands can be one coefficient longer than
+    the closed-form ones; the block grids must still agree.
+    """
+    size = 2**level
+    return all(
+        length // size // block_size == -(-length // size) // block_size
+        for length in shape[:2]
+    )
+
+
+def add_coefficient_deltas(
+    image: np.ndarray,
+    level: int,
+    coefficient: str,
+    indices: tuple[np.ndarray, np.ndarray],
+    deltas: np.ndarray,
+) -> np.ndarray:
+    """Adds the pixel-domain effect of changing detail coefficients, in place.
+
+    Changing a level detail coefficient by ``delta`` adds ``+/-delta / 2**level``
+    to the quadrants of its 2**level x 2**level pixel block. ``image`` must be a
+    contiguous float array with sides divisible by 2**level.
+    """
+    size = 2**level
+    half = size // 2
+    height, width = image.shape[0] // size, image.shape[1] // size
+    pixels = image.reshape((height, 2, half, width, 2, half) + image.shape[2:])
+    signs = QUADRANT_SIGNS[coefficient].astype(image.dtype) / image.dtype.type(size)
+    quadrant_deltas = np.multiply.outer(deltas, signs)
+    quadrant_deltas = np.moveaxis(quadrant_deltas, (-2, -1), (1, 2))
+    rows, cols = indices
+    pixels[rows, :, :, cols] += quadrant_deltas[:, :, np.newaxis, :, np.newaxis]
+    return image
+
+
+def divides(shape: tuple, level: int) -> bool:
+    """Checks that an image splits into whole 2**level x 2**level pixel blocks."""
+    return all(length % 2**level == 0 for length in shape[:2])
@@ -0,0 +1,186 @@
+import struct
+
+import numpy as np
+
+from stego.core import blocking
+from stego.core import coder
+from stego.core import message as msg_utils
+from stego.core import multichannel_coder
+from stego.core.errors import ConfigError
+
+VERSION = 1
+
+# Fixed parameters of the header. Haar details of different levels are
+# orthogonal, so a body at another level mostly does not see the header,
+# but uint8 rounding, and for other wavelets their overlap with Haar, still
+# flip a few body bits; the body relies on its ECC to absorb them.
+HEADER_PARAMETERS = {
+    "coefficients": ["ad", "da", "dd"],
+    "alpha": 1,
+    "block_size": 4,
+    "level": 4,
+    "wavelet": "haar",
+    "color_space": "YCrCb",
+    "use_channels": [0],
+    "ecc_symbols": 8,
+}
+# Defaults of the body parameters the header records, as in
+# ``multichannel_coder.encode_color_image``.
+BODY_DEFAULTS = {"alpha": 1, "block_size": 3, "level": 2, "wavelet": "haar"}
+HEADER_UNIT = HEADER_PARAMETERS["block_size"] * 2 ** HEADER_PARAMETERS["level"]
+# The header only covers the top-left 16 x 16 units (1024 x 1024 pixels),
+# enough for three copies, to keep its distortion small.
+HEADER_UNITS = 16
+
+COEFFICIENTS = ("ad", "da", "dd")
+COLOR_SPACES = tuple(multichannel_coder.color_spaces)
+
+# version, alpha * 100, block size, level, wavelet, color space,
+# channel mask, coefficients (2 bits each, in order), ECC symbols, ECC length
+HEADER_FORMAT = struct.Struct(">BHBB8sBBBBH")
+
+
+def pack_header(parameters: dict, ecc_length: int) -> bytes:
+    """Packs encoder parameters and the ECC message length into a header."""
+    coefficient_codes = 0
+    for index, coefficient in enumerate(parameters["coefficients"]):
+        coefficient_codes |= (COEFFICIENTS.index(coefficient) + 1) << (2 * index)
+    return HEADER_FORMAT.pack(
+        VERSION,
+        round(parameters["alpha"] * 100),
+        parameters["block_size"],
+        parameters["level"],
+        parameters["wavelet"].encode("ASCII"),
+        COLOR_SPACES.index(parameters["color_space"]),
+        sum(1 << channel for channel in parameters["use_channels"]),
+        coefficient_codes,
+        parameters["ecc_symbols"],
+        ecc_length,
+    )
+
+
+def unpack_header(header: bytes) -> dict | None:
+    """Returns the parameters and ``ecc_length`` of a header, None if invalid."""
+    if len(header) != HEADER_FORMAT.size:
+        return None
+    (
+        version,
+        alpha,
+        block_size,
+        level,
+        wavelet,
+        color_space,
+        channel_mask,
+        coefficient_codes,
+        ecc_symbols,
+        ecc_length,
+    ) = HEADER_FORMAT.unpack(header)
+    if version != VERSION or color_space >= len(COLOR_SPACES):
+        return None
+    coefficients = []
+    while coefficient_codes & 3:
+        coefficients.append(COEFFICIENTS[(coefficient_codes & 3) - 1])
+        coefficient_codes >>= 2
+    return {
+        "coefficients": coefficients,
+        "alpha": alpha / 100,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet.rstrip(b"\x00").decode("ASCII", errors="replace"),
+        "color_space": COLOR_SPACES[color_space],
+        "use_channels": [
+            channel for channel in range(3) if channel_mask >> channel & 1
+        ],
+        "ecc_symbols": ecc_symbols,
+        "ecc_length": ecc_length,
+    }
+
+
+def check_parameters(parameters: dict):
+    """Raises ``ConfigError`` when a body cannot share an image with the header."""
+    if parameters["level"] == HEADER_PARAMETERS["level"]:
+        raise ConfigError(
+            f"Level {HEADER_PARAMETERS['level']} is reserved for the header"
+        )
+    if len(parameters["wavelet"]) > 8:
+        raise ConfigError(
+            f"Wavelet name too long for the header: {parameters['wavelet']}"
+        )
+
+
+def check_image(image: np.ndarray):
+    """Raises ``ConfigError`` when the header does not fit into an image."""
+    header_length = HEADER_FORMAT.size + HEADER_PARAMETERS["ecc_symbols"] + 1
+    image_capacity, _ = coder.get_capacity(header_region(image), **HEADER_PARAMETERS)
+    if image_capacity < header_length:
+        raise ConfigError(
+            f"Image of {image.shape[1]}x{image.shape[0]} pixels is too small for "
+            f"the header, which needs {header_length} bytes in its top-left "
+            f"{HEADER_UNITS * HEADER_UNIT}x{HEADER_UNITS * HEADER_UNIT} pixels"
+        )
+
+
+def header_region(image: np.ndarray) -> np.ndarray:
+    """Returns the top-left part of an image that holds the header blocks."""
+    height, width = (
+        min(length // HEADER_UNIT, HEADER_UNITS) * HEADER_UNIT
+        for length in image.shape[:2]
+    )
+    return image[:height, :width]
+
+
+def encode_color_image(
+    image: np.ndarray, message: bytes, **parameters
+) -> (np.ndarray, np.ndarray, bytes):
+    """Encodes like ``multichannel_coder.encode_color_image`` and adds a header.
+
+    The header records the parameters and message length, so the image can
+    be decoded by ``decode_color_image`` without them. Embedding the header
+    after the body flips a few body bits, which the ECC of the body has to
+    correct.
+    """
+    parameters = {**BODY_DEFAULTS, **parameters}
+    check_parameters(parameters)
+    height, width = blocking.get_new_shape(
+        image, parameters["block_size"] * 2 ** parameters["level"]
+    )
+    check_image(image[:height, :width])
+    image, stego, message_raw = multichannel_coder.encode_color_image(
+        image, message, **parameters
+    )
+    ecc_length = len(msg_utils.encode_ecc(message, **parameters))
+    header = pack_header(parameters, ecc_length)
+    region = header_region(stego)
+    _, region_stego, _ = multichannel_coder.encode_color_image(
+        region, header, **HEADER_PARAMETERS
+    )
+    region[...] = region_stego
+    return image, stego, message_raw
+
+
+def read_header(image: np.ndarray) -> dict | None:
+    """Returns the parameters recorded in the header of an image, or None."""
+    header, _, _ = multichannel_coder.decode_color_image(
+        header_region(image),
+        **HEADER_PARAMETERS,
+        ecc_length=HEADER_FORMAT.size + HEADER_PARAMETERS["ecc_symbols"],
+    )
+    if header is None:
+        return None
+    return unpack_header(bytes(header))
+
+
+def decode_color_image(image: np.ndarray) -> (bytearray | None, bytes, bytes, dict):
+    """Decodes an image encoded with a header, without knowing its parameters.
+
+    Returns the results of ``multichannel_coder.decode_color_image`` and the
+    parameters read from the header. Raises ``ValueError`` when the image
+    has no readable header.
+    """
+    parameters = read_header(image)
+    if parameters is None:
+        raise ValueError("No readable header found")
+    message, ecc_message, message_raw = multichannel_coder.decode_color_image(
+        image, **parameters
+    )
+    return message, ecc_message, message_raw, parameters
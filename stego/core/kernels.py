@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def _block_statistics(blocks: np.ndarray, dtype: type) -> tuple[np.ndarray, np.ndarray]:
+    center_index = blocks.shape[2] // 2
+    sums = blocks.sum(axis=(2, 3), dtype=dtype)
+    centers = blocks[:, :, center_index, center_index].astype(dtype)
+    return sums, centers
+
+
+def block_statistics_f32(blocks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return _block_statistics(blocks, np.float32)
+
+
+def block_statistics_f64(blocks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return _block_statistics(blocks, np.float64)
+
+
+def block_statistics(blocks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns per-block sums and center values of a block grid.
+
+    ``blocks`` is a (blocks_high, blocks_wide, bs, bs, ...) array, usually a
+    ``blocking.block_view``. float32 input is reduced in float32, anything
+    else in float64.
+    """
+    if blocks.dtype == np.float32:
+        return block_statistics_f32(blocks)
+    return block_statistics_f64(blocks)
+
+
+def block_means(sums: np.ndarray, block_size: int) -> np.ndarray:
+    """Mean of every block, center included."""
+    return sums / sums.dtype.type(block_size**2)
+
+
+def center_margins(
+    sums: np.ndarray, centers: np.ndarray, block_size: int
+) -> np.ndarray:
+    """Difference between each center and the mean of the rest of its block."""
+    return centers - (sums - centers) / sums.dtype.type(block_size**2 - 1)
@@ -1,6 +1,32 @@
+from functools import lru_cache
+
 import numpy as np
-from reedsolo import RSCodec
-from scipy import stats
+from reedsolo import ReedSolomonError, RSCodec
+
+BYTE = 8
+
+# GF(2**8) parameters of the codecs, the ``RSCodec`` defaults.
+PRIMITIVE = 0x11D
+GENERATOR = 2
+FIRST_ROOT = 0
+FIELD_SIZE = 255
+
+
+def _field_tables() -> tuple[np.ndarray, np.ndarray]:
+    exp = np.zeros(2 * FIELD_SIZE, dtype=np.int32)
+    log = np.zeros(FIELD_SIZE + 1, dtype=np.int32)
+    value = 1
+    for power in range(FIELD_SIZE):
+        exp[power] = value
+        log[value] = power
+        value <<= 1
+        if value > FIELD_SIZE:
+            value ^= PRIMITIVE
+    exp[FIELD_SIZE:] = exp[:FIELD_SIZE]
+    return exp, log
+
+
+GF_EXP, GF_LOG = _field_tables()
 
 
 def bytes_to_binary(byte_data: bytes) -> np.ndarray:
@@ -37,6 +63,8 @@ def find_original_string(message: bytes):
 
     messages = np.array(messages)
 
+    from scipy import stats
+
     modes, _ = stats.mode(messages)
 
     result_message = modes.astype(np.uint8).tobytes()
@@ -44,11 +72,387 @@ def find_original_string(message: bytes):
     return result_message
 
 
+# Smallest autocorrelation, in standard deviations of uncorrelated bits,
+# taken as a repetition of the message.
+MIN_PERIOD_Z_SCORE = 6
+
+
+def period_scores(signal: np.ndarray) -> np.ndarray:
+    """Returns the normalized autocorrelation of (copies, bits) at byte shifts.
+
+    ``signal`` holds bits or signed soft bits. Values are centered per
+    position within a byte, so biased bits such as the high bit of ASCII text
+    do not correlate. Element ``p`` is close to 1 when every copy repeats
+    with a period of ``p`` bytes, and close to 0 when it does not.
+    """
+    copies, length = signal.shape
+    signal = signal.reshape(copies, -1, BYTE).astype(np.float64)
+    signal = (signal - signal.mean(axis=(0, 1))).reshape(copies, length)
+    spectrum = np.fft.rfft(signal, n=2 * length)
+    correlation = np.fft.irfft(np.abs(spectrum) ** 2, n=2 * length)[:, :length]
+    correlation = correlation.sum(axis=0)[::BYTE]
+    overlap = copies * (length - np.arange(0, length, BYTE))
+    variance = max((signal**2).mean(), np.finfo(np.float64).tiny)
+    return correlation / overlap / variance
+
+
+def signal_period(signal: np.ndarray, min_period: int = 2) -> int | None:
+    """Estimates the repetition period of (copies, bits) payloads, in bytes.
+
+    Runs of equal bytes in a message correlate at every short shift, so
+    shifts are scored by how far they stand out from their neighbours.
+    Multiples of the period stand out as much as the period itself, so the
+    shortest divisor of the best shift that scores about as well is
+    returned, or None when the payload does not repeat.
+    """
+    copies, length = signal.shape
+    max_period = length // BYTE // 2
+    if max_period < min_period:
+        return None
+    correlations = period_scores(signal)[: max_period + 2]
+    scores = np.full(max_period + 1, -np.inf)
+    neighbours = np.maximum((correlations[:-2] + correlations[2:]) / 2, 0)
+    scores[1:] = correlations[1:-1] - neighbours
+    scores[:min_period] = -np.inf
+    best_period = int(np.argmax(scores))
+    best_score = scores[best_period]
+    overlap = copies * (length - best_period * BYTE)
+    if best_score * np.sqrt(overlap) < MIN_PERIOD_Z_SCORE:
+        return None
+    return next(
+        period
+        for period in range(min_period, best_period + 1)
+        if best_period % period == 0 and scores[period] >= 0.8 * best_score
+    )
+
+
+def estimate_period(
+    message_raw: bytes, copies: int = 1, min_period: int = 2
+) -> int | None:
+    """Estimates the repetition period of dispatched payloads, in bytes.
+
+    ``message_raw`` holds ``copies`` payloads of equal length, e.g. one per
+    channel; see ``signal_period``.
+    """
+    raw = np.frombuffer(message_raw, dtype=np.uint8).reshape(copies, -1)
+    return signal_period(np.unpackbits(raw, axis=1), min_period)
+
+
+def majority_vote(message_raw: bytes, period: int, copies: int = 1) -> bytes:
+    """Votes bitwise over every repetition of a ``period``-byte message.
+
+    ``message_raw`` holds ``copies`` payloads built by
+    ``coder.message_dispatcher``; the zero padding after the last complete
+    repetition of every copy is ignored.
+    """
+    raw = np.frombuffer(message_raw, dtype=np.uint8).reshape(copies, -1)
+    repetitions = raw.shape[1] // period
+    votes = raw[:, : repetitions * period].reshape(-1, period)
+    ones = np.unpackbits(votes, axis=1).sum(axis=0, dtype=np.int64)
+    return np.packbits(2 * ones > len(votes)).tobytes()
+
+
+def vote_message(
+    message_raw: bytes, copies: int = 1, period: int | None = None
+) -> bytes:
+    """Recovers the ECC message from a raw payload by bitwise majority.
+
+    ``period`` is ``len(ecc_message) + 1`` as used by
+    ``coder.message_dispatcher``; it is estimated when not given. Payloads
+    without repetitions are voted across copies only, with the trailing
+    padding removed.
+    """
+    if period is None:
+        period = estimate_period(message_raw, copies)
+    if period is None:
+        length = len(message_raw) // copies
+        return majority_vote(message_raw, length, copies).rstrip(b"\x00")
+    return majority_vote(message_raw, period, copies)[:-1]
+
+
+def repetition_sums(values: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns per-bit sums and sums of squares over every repetition.
+
+    ``values`` is (copies, bits) of signed reliabilities, positive for ones,
+    in the layout of ``majority_vote``.
+    """
+    bits = period * BYTE
+    repetitions = values.shape[1] // bits
+    votes = values[:, : repetitions * bits].reshape(-1, bits)
+    return votes.sum(axis=0), np.square(votes).sum(axis=0)
+
+
+def soft_vote(values: np.ndarray, period: int) -> bytes:
+    """Sums soft bits over every repetition of a ``period``-byte message."""
+    sums, _ = repetition_sums(values, period)
+    return np.packbits(sums > 0).tobytes()
+
+
+def byte_reliabilities(sums: np.ndarray, squares: np.ndarray) -> np.ndarray:
+    """Returns the reliability of every voted byte, its least reliable bit.
+
+    A bit is as reliable as its votes agree: the sum over the root of the
+    summed squares is the root of the number of repetitions when all agree
+    equally, and small when margins are weak or repetitions disagree.
+    """
+    bits = np.abs(sums) / np.sqrt(np.maximum(squares, np.finfo(np.float64).tiny))
+    return bits.reshape(-1, BYTE).min(axis=1)
+
+
+def soft_vote_with_reliability(
+    values: np.ndarray, period: int | None = None
+) -> tuple[bytes, np.ndarray]:
+    """Returns the ECC message of ``soft_vote_message`` and byte reliabilities."""
+    if period is None:
+        period = signal_period(values)
+    if period is None:
+        return soft_vote_payload(values)
+    sums, squares = repetition_sums(values, period)
+    message = np.packbits(sums > 0).tobytes()[:-1]
+    reliabilities = byte_reliabilities(sums, squares)
+    return message, reliabilities[: len(message)]
+
+
+def soft_vote_payload(values: np.ndarray) -> tuple[bytes, np.ndarray]:
+    """Votes a payload without repetitions across copies only.
+
+    Returns the ECC message with the trailing padding removed, and byte
+    reliabilities. Trailing zeros of the ECC message are lost with the
+    padding.
+    """
+    sums, squares = repetition_sums(values, values.shape[1] // BYTE)
+    message = np.packbits(sums > 0).tobytes().rstrip(b"\x00")
+    reliabilities = byte_reliabilities(sums, squares)
+    return message, reliabilities[: len(message)]
+
+
+def soft_vote_message(values: np.ndarray, period: int | None = None) -> bytes:
+    """Recovers the ECC message from soft bits, see ``vote_message``.
+
+    The period is estimated from the soft bits when not given.
+    """
+    message, _ = soft_vote_with_reliability(values, period)
+    return message
+
+
+# ECC symbols left unused by erasure decoding to reject wrong corrections.
+SPARE_ECC_SYMBOLS = 2
+
+
+@lru_cache
+def get_codec(ecc_symbols: int) -> RSCodec:
+    """Returns the codec shared by all calls with the same ``ecc_symbols``."""
+    return RSCodec(ecc_symbols)
+
+
 def encode_ecc(message: bytes, ecc_symbols, **kwargs):
-    rsc = RSCodec(ecc_symbols)
-    return rsc.encode(message)
+    return get_codec(ecc_symbols).encode(message)
 
 
 def decode_ecc(message: bytes, ecc_symbols, **kwargs):
-    rsc = RSCodec(ecc_symbols)
-    return rsc.decode(message)
+    return get_codec(ecc_symbols).decode(message)
+
+
+def decode_ecc_with_erasures(
+    message: bytes, reliabilities: np.ndarray, ecc_symbols, **kwargs
+):
+    """Decodes like ``decode_ecc``, erasing unreliable bytes when that fails.
+
+    An erased byte costs one ECC symbol instead of two, so after a plain
+    decode fails, growing sets of the least reliable bytes are erased. With
+    erasures the decoder finds a codeword for almost any input, so a result
+    is only accepted when it leaves ``SPARE_ECC_SYMBOLS`` symbols unused.
+    """
+    codec = get_codec(ecc_symbols)
+    try:
+        return codec.decode(message)
+    except ReedSolomonError as error:
+        last_error = error
+    order = [int(position) for position in np.argsort(reliabilities, kind="stable")]
+    budget = min(ecc_symbols, len(order)) - SPARE_ECC_SYMBOLS
+    for count in range(2, budget + 1, 2):
+        erasures = order[:count]
+        try:
+            result = codec.decode(message, erase_pos=erasures)
+        except ReedSolomonError as error:
+            last_error = error
+            continue
+        errors = len(set(result[2]) - set(erasures))
+        if 2 * errors + count <= budget:
+            return result
+        last_error = ReedSolomonError("Too many errata to correct reliably")
+    raise last_error
+
+
+def codeword_period(values: np.ndarray, ecc_symbols: int) -> int | None:
+    """Estimates the period of (copies, bits) payloads of ECC messages.
+
+    An ECC message no longer than ``ecc_symbols`` is no codeword, though the
+    decoder accepts any such word, so shorter periods are not considered.
+    Structured messages, e.g. of small integers, otherwise correlate at
+    short shifts that stand out more than the period of a payload repeated
+    only once or twice.
+    """
+    return signal_period(values, ecc_symbols + 2)
+
+
+def is_payload_codeword(codeword: bytes, ecc_symbols: int) -> bool:
+    """Returns whether a decoded codeword can be a dispatched ECC message.
+
+    The decoder accepts any word no longer than ``ecc_symbols``, and zero
+    padding, or a zero-rich message voted with a wrong period, decodes to
+    the all-zero codeword, so neither is taken as a message.
+    """
+    return len(codeword) > ecc_symbols and any(codeword)
+
+
+def decode_soft_bits(
+    values: np.ndarray, ecc_symbols: int, period: int | None = None
+) -> tuple[bytearray | None, bytes]:
+    """Votes and error-corrects the ECC message of (copies, bits) soft bits.
+
+    ``period`` is estimated by ``codeword_period`` when not given, and when
+    the message voted with it does not decode to an ``is_payload_codeword``,
+    the whole payload is voted instead, as payloads repeated only once have
+    no period. Returns the message, None when error correction fails, and
+    the first voted ECC message.
+    """
+    if period is not None:
+        votes = [soft_vote_with_reliability(values, period)]
+    else:
+        period = codeword_period(values, ecc_symbols)
+        votes = [soft_vote_payload(values)]
+        if period is not None:
+            votes.insert(0, soft_vote_with_reliability(values, period))
+    for ecc_message, reliabilities in votes:
+        try:
+            message, message_ecc, _ = decode_ecc_with_erasures(
+                ecc_message, reliabilities, ecc_symbols
+            )
+        except ReedSolomonError:
+            continue
+        if is_payload_codeword(message_ecc, ecc_symbols):
+            return (message if message else message_ecc), ecc_message
+    return None, votes[0][0]
+
+
+def gf_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Multiplies GF(2**8) elements elementwise, with broadcasting."""
+    a, b = np.asarray(a), np.asarray(b)
+    product = GF_EXP[GF_LOG[a] + GF_LOG[b]]
+    return np.where((a == 0) | (b == 0), 0, product).astype(np.uint8)
+
+
+@lru_cache
+def generator_polynomial(ecc_symbols: int) -> np.ndarray:
+    """Returns the RS generator polynomial, highest degree first."""
+    polynomial = np.ones(1, dtype=np.uint8)
+    for power in range(FIRST_ROOT, FIRST_ROOT + ecc_symbols):
+        root = GF_EXP[power * GF_LOG[GENERATOR] % FIELD_SIZE]
+        polynomial = np.append(polynomial, 0) ^ np.append(
+            0, gf_multiply(polynomial, root)
+        )
+    polynomial.flags.writeable = False
+    return polynomial
+
+
+def syndromes(codewords: np.ndarray, ecc_symbols: int) -> np.ndarray:
+    """Returns the (codewords, ecc_symbols) syndromes of a 2-D uint8 array.
+
+    All syndromes of a valid codeword are zero. Codewords must not be longer
+    than the field.
+    """
+    length = codewords.shape[1]
+    roots = np.arange(FIRST_ROOT, FIRST_ROOT + ecc_symbols) * GF_LOG[GENERATOR]
+    degrees = np.arange(length - 1, -1, -1)
+    logs = (GF_LOG[codewords][:, np.newaxis] + np.outer(roots, degrees)) % FIELD_SIZE
+    terms = np.where(codewords[:, np.newaxis] == 0, 0, GF_EXP[logs])
+    return np.bitwise_xor.reduce(terms, axis=-1)
+
+
+def encode_ecc_batch(messages: np.ndarray, ecc_symbols: int) -> np.ndarray:
+    """Encodes a (messages, bytes) uint8 array of equal-length messages.
+
+    Returns the codewords ``encode_ecc`` returns, one per row, chunked the
+    same way.
+    """
+    messages = np.asarray(messages, dtype=np.uint8)
+    generator = generator_polynomial(ecc_symbols)
+    chunk_size = FIELD_SIZE - ecc_symbols
+    chunks = []
+    for start in range(0, messages.shape[1], chunk_size):
+        chunk = messages[:, start : start + chunk_size]
+        remainder = np.zeros((len(messages), ecc_symbols), dtype=np.uint8)
+        for column in chunk.T:
+            feedback = column ^ remainder[:, 0]
+            remainder[:, :-1] = remainder[:, 1:]
+            remainder[:, -1] = 0
+            remainder ^= gf_multiply(feedback[:, np.newaxis], generator[1:])
+        chunks += [chunk, remainder]
+    return np.concatenate(chunks, axis=1) if chunks else messages.copy()
+
+
+def decode_ecc_batch(
+    codewords: np.ndarray, ecc_symbols: int
+) -> list[tuple[bytearray, bytearray, bytearray] | None]:
+    """Decodes a (codewords, bytes) uint8 array of equal-length codewords.
+
+    Returns what ``decode_ecc`` returns for every row, or None where it
+    raises. Syndromes of all rows are computed together, and only rows with
+    errors go through the full decoder.
+    """
+    codewords = np.asarray(codewords, dtype=np.uint8)
+    length = codewords.shape[1]
+    chunk_starts = range(0, length, FIELD_SIZE)
+    is_valid = np.full(len(codewords), min(length, FIELD_SIZE) > ecc_symbols)
+    if length % FIELD_SIZE:
+        is_valid &= length % FIELD_SIZE > ecc_symbols
+    for start in chunk_starts:
+        chunk = codewords[:, start : start + FIELD_SIZE]
+        is_valid &= ~syndromes(chunk, ecc_symbols).any(axis=1)
+
+    results = []
+    for codeword, valid in zip(codewords, is_valid):
+        if valid:
+            message = bytearray()
+            for start in chunk_starts:
+                chunk = codeword[start : start + FIELD_SIZE]
+                message += chunk[:-ecc_symbols].tobytes()
+            results.append((message, bytearray(codeword.tobytes()), bytearray()))
+            continue
+        try:
+            results.append(decode_ecc(codeword.tobytes(), ecc_symbols))
+        except ReedSolomonError:
+            results.append(None)
+    return results
+
+
+def encode_ecc_messages(messages: list[bytes], ecc_symbols: int) -> list[bytearray]:
+    """Encodes messages of any lengths, each length group as one batch."""
+    codewords = [None] * len(messages)
+    for length, indices in _length_groups(messages).items():
+        batch = np.frombuffer(b"".join(messages[i] for i in indices), np.uint8)
+        encoded = encode_ecc_batch(batch.reshape(len(indices), length), ecc_symbols)
+        for index, codeword in zip(indices, encoded):
+            codewords[index] = bytearray(codeword.tobytes())
+    return codewords
+
+
+def decode_ecc_messages(
+    codewords: list[bytes], ecc_symbols: int
+) -> list[tuple[bytearray, bytearray, bytearray] | None]:
+    """Decodes codewords of any lengths, each length group as one batch."""
+    results = [None] * len(codewords)
+    for length, indices in _length_groups(codewords).items():
+        batch = np.frombuffer(b"".join(codewords[i] for i in indices), np.uint8)
+        decoded = decode_ecc_batch(batch.reshape(len(indices), length), ecc_symbols)
+        for index, result in zip(indices, decoded):
+            results[index] = result
+    return results
+
+
+def _length_groups(messages: list[bytes]) -> dict[int, list[int]]:
+    groups = {}
+    for index, message in enumerate(messages):
+        groups.setdefault(len(message), []).append(index)
+    return groups
@@ -6,7 +6,7 @@ from stego.core import blocking
 from stego.core.utils import match_sizes
 
 
-def get_metrics(img1, img2):
+def get_metrics(img1, img2, precision="float64"):
     stats = {
         "img1": {
             "min": np.min(img1),
@@ -18,14 +18,15 @@ def get_metrics(img1, img2):
             "max": np.max(img2),
             "shape": img2.shape[:2],
         },
-        "diff": diff_metrics(img1, img2),
+        "diff": diff_metrics(img1, img2, precision),
     }
 
     return stats
 
 
-def diff_metrics(img1, img2):
+def diff_metrics(img1, img2, precision="float64"):
     img1, img2 = match_sizes(img1, img2)
+    img1, img2 = img1.astype(precision), img2.astype(precision)
     is_grayscale = img1.ndim == 2
     data_range = max(np.max(img1), np.max(img2)) - min(np.min(img1), np.min(img2))
 
@@ -47,13 +48,13 @@ def mean_diff(img1, img2, **kwargs):
     return {"mean_diff": np.mean(img1) - np.mean(img2)}
 
 
-def thresholds(original, compressed, data_range=255):
+def thresholds(original, compressed, data_range=255, precision="float64"):
     block_size = 3
-    diff = cv2.absdiff(original, compressed) / data_range
-    diff_blocks = blocking.divide_image(diff, block_size)
+    diff = cv2.absdiff(original, compressed).astype(precision) / data_range
+    diff_blocks = blocking.block_view(diff, block_size)
     return {
         "mean_block_threshold_90": np.quantile(
-            np.abs(np.mean(diff_blocks, axis=(1, 2))), 0.9
+            np.abs(np.mean(diff_blocks, axis=(2, 3))), 0.9
         ),
         "pixel_threshold_90": np.quantile(np.abs(diff), 0.9),
     }
@@ -5,6 +5,7 @@ from reedsolo import ReedSolomonError
 from stego.core import blocking
 from stego.core import coder
 from stego.core import message as msg_utils
+from stego.core import parallel
 
 color_spaces = {
     "RGB": None,
@@ -59,6 +60,8 @@ def encode_color_image(
     color_space: str,
     use_channels: list[int],
     ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
     **kwargs,
 ) -> (np.ndarray, np.ndarray, bytes):
     """Encodes a message into a color image."""
@@ -69,6 +72,8 @@ def encode_color_image(
         "level": level,
         "wavelet": wavelet,
         "ecc_symbols": ecc_symbols,
+        "precision": precision,
+        "workers": workers,
     }
 
     ecc_message = msg_utils.encode_ecc(message, **parameters)
@@ -76,14 +81,12 @@ def encode_color_image(
     image, _ = blocking.crop_image_to_divisible(image, block_size * 2**level)
 
     message_parts = coder.message_dispatcher(image, ecc_message, **parameters)
-    channels = list(cv2.split(rgb_to_color_space(image, color_space)))
+    channels = rgb_to_color_space(image, color_space).copy()
+    channels[:, :, use_channels] = coder.encode(
+        channels[:, :, use_channels], message_parts, **parameters
+    )
 
-    for channel_index in use_channels:
-        channel = channels[channel_index]
-        encoded_channel = coder.encode(channel, message_parts, **parameters)
-        channels[channel_index] = encoded_channel
-
-    stego = color_space_to_rgb(cv2.merge(channels), color_space)
+    stego = color_space_to_rgb(channels, color_space)
     return image, stego, b"".join(message_parts)
 
 
@@ -97,29 +100,234 @@ def decode_color_image(
     color_space: str,
     use_channels: list[int],
     ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
+    ecc_length: int | None = None,
     **kwargs,
 ) -> (bytearray | None, bytes, bytes):
-    """Decodes a message from a color image."""
+    """Decodes a message from a color image.
+
+    ``ecc_length``, the length of the ECC message when known, fixes the
+    repetition period instead of estimating it.
+    """
     parameters = {
         "coefficients": coefficients,
         "block_size": block_size,
         "level": level,
         "wavelet": wavelet,
         "ecc_symbols": ecc_symbols,
+        "precision": precision,
+        "workers": workers,
     }
 
-    channels = cv2.split(rgb_to_color_space(image, color_space))
-
-    message_parts = []
-    for channel_index in use_channels:
-        message_parts += coder.decode(channels[channel_index], **parameters)
+    channels = rgb_to_color_space(image, color_space)
+    margins = coder.extract_margins(channels[:, :, use_channels], **parameters)
 
-    message_raw = coder.message_consolidator(image, message_parts, **parameters)
-    ecc_message = msg_utils.find_original_string(message_raw)
-    try:
-        message, message_ecc, _ = msg_utils.decode_ecc(ecc_message, **parameters)
-        if not message:
-            message = message_ecc
-    except ReedSolomonError:
-        message = None
+    _, coefficient_capacity = coder.get_capacity(image, **parameters)
+    soft_bits = coder.soft_payload(margins, coefficient_capacity)
+    message_raw = np.packbits(soft_bits > 0, axis=-1).tobytes()
+    period = None if ecc_length is None else ecc_length + 1
+    message, ecc_message = msg_utils.decode_soft_bits(soft_bits, ecc_symbols, period)
     return message, ecc_message, message_raw
+
+
+def decode_color_image_progressive(
+    image: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    ecc_symbols: int,
+    precision: str = "float64",
+    **kwargs,
+) -> (bytearray | None, bytes, int):
+    """Decodes a message band by band, stopping at the first valid codeword.
+
+    Channels are transformed only when reached, and the payload repetitions
+    voted so far are decoded after every band, without erasures; only an
+    ``is_payload_codeword`` stops early. Clean images usually decode from
+    the first band. The last band decodes all of them like
+    ``decode_color_image``. Returns the message (None when error correction
+    fails), the voted ECC message and the number of bands used.
+    """
+    parameters = {
+        "coefficients": coefficients,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "ecc_symbols": ecc_symbols,
+        "precision": precision,
+    }
+
+    channels = rgb_to_color_space(image, color_space)
+    _, coefficient_capacity = coder.get_capacity(image, **parameters)
+    band_bits = coefficient_capacity * coder.BYTE
+    soft_bits = np.zeros((len(use_channels), len(coefficients) * band_bits))
+    band_count = soft_bits.size // band_bits
+
+    bands_used = 0
+    for copy, channel in enumerate(use_channels):
+        bands = coder.detail_bands(channels[:, :, channel], **parameters)
+        for index, coefficient in enumerate(coefficients):
+            soft_bits[copy, index * band_bits : (index + 1) * band_bits] = (
+                coder.band_soft_bits(
+                    bands[coefficient], block_size, coefficient_capacity
+                )
+            )
+            bands_used += 1
+            if bands_used == band_count:
+                break
+
+            # Until the first copy is complete, only its decoded part repeats.
+            if copy == 0:
+                decoded_bits = soft_bits[:1, : bands_used * band_bits]
+            else:
+                decoded_bits = soft_bits[: copy + 1]
+            period = msg_utils.codeword_period(decoded_bits, ecc_symbols)
+            if period is None or period * coder.BYTE > decoded_bits.shape[1]:
+                continue
+            ecc_message = msg_utils.soft_vote_message(soft_bits, period)
+            try:
+                message, message_ecc, _ = msg_utils.decode_ecc(ecc_message, ecc_symbols)
+            except ReedSolomonError:
+                continue
+            if msg_utils.is_payload_codeword(message_ecc, ecc_symbols):
+                return (message if message else message_ecc), ecc_message, bands_used
+    message, ecc_message = msg_utils.decode_soft_bits(soft_bits, ecc_symbols)
+    return message, ecc_message, bands_used
+
+
+def encode_color_images(
+    images: np.ndarray,
+    messages: list[bytes],
+    *,
+    coefficients: list[str],
+    alpha: float = 1,
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Encodes one message into each image of an (images, height, width, 3) stack.
+
+    All images are transformed and embedded together; only error correction
+    and dispatching run per message. Returns the cropped images, the stego
+    images and the (images, capacity) embedded payloads.
+    """
+    parameters = {
+        "coefficients": coefficients,
+        "alpha": alpha,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "ecc_symbols": ecc_symbols,
+        "precision": precision,
+        "workers": workers,
+    }
+
+    height, width = blocking.get_new_shape(images[0], block_size * 2**level)
+    images = images[:, :height, :width]
+
+    ecc_messages = msg_utils.encode_ecc_messages(messages, ecc_symbols)
+    payloads = np.stack(
+        [
+            np.frombuffer(
+                b"".join(
+                    coder.message_dispatcher(images[0], ecc_message, **parameters)
+                ),
+                dtype=np.uint8,
+            )
+            for ecc_message in ecc_messages
+        ]
+    )
+    message_parts = payloads.reshape(len(images), 1, len(coefficients), -1)
+
+    channels = np.stack(
+        parallel.map_ordered(
+            lambda image: rgb_to_color_space(image, color_space), images, workers
+        )
+    )
+    selected = np.moveaxis(channels[..., use_channels], 0, 2)
+    encoded = coder.encode(selected, message_parts, **parameters)
+    channels[..., use_channels] = np.moveaxis(encoded, 2, 0)
+
+    stego = np.stack(
+        parallel.map_ordered(
+            lambda image: color_space_to_rgb(image, color_space), channels, workers
+        )
+    )
+    return images, stego, payloads
+
+
+def decode_color_images(
+    images: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Decodes messages from an (images, height, width, 3) stack.
+
+    Returns object arrays of the messages (None when error correction fails)
+    and of the voted ECC messages, and the (images, bytes) raw payloads.
+    """
+    parameters = {
+        "coefficients": coefficients,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "ecc_symbols": ecc_symbols,
+        "precision": precision,
+        "workers": workers,
+    }
+
+    if color_space == "RGB":
+        channels = images
+    else:
+        channels = np.stack(
+            parallel.map_ordered(
+                lambda image: rgb_to_color_space(image, color_space), images, workers
+            )
+        )
+    selected = np.moveaxis(channels[..., use_channels], 0, 2)
+    margins = coder.extract_margins(selected, **parameters)
+
+    _, coefficient_capacity = coder.get_capacity(images[0], **parameters)
+    soft_bits = coder.soft_payload(margins, coefficient_capacity)
+    raw = np.packbits(soft_bits > 0, axis=-1).reshape(len(images), -1)
+
+    messages = np.empty(len(images), dtype=object)
+    ecc_messages = np.empty(len(images), dtype=object)
+    for index, image_bits in enumerate(soft_bits):
+        period = msg_utils.codeword_period(image_bits, ecc_symbols)
+        if period is None:
+            ecc_messages[index], _ = msg_utils.soft_vote_payload(image_bits)
+        else:
+            ecc_messages[index] = msg_utils.soft_vote_message(image_bits, period)
+    # Codewords that do not decode as they are go through the erasure
+    # retries and fallbacks of ``decode_soft_bits``.
+    decoded = msg_utils.decode_ecc_messages(list(ecc_messages), ecc_symbols)
+    for index, result in enumerate(decoded):
+        if result is None or not msg_utils.is_payload_codeword(result[1], ecc_symbols):
+            messages[index], ecc_messages[index] = msg_utils.decode_soft_bits(
+                soft_bits[index], ecc_symbols
+            )
+            continue
+        message, message_ecc, _ = result
+        messages[index] = message if message else message_ecc
+    return messages, ecc_messages, raw
@@ -0,0 +1,43 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Iterable
+
+import numpy as np
+
+
+def resolve_workers(workers: int | None) -> int:
+    """Returns the number of threads to use, 0 or None meaning one per core."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+@lru_cache
+def get_executor(workers: int) -> ThreadPoolExecutor:
+    """Returns the thread pool shared by all calls with the same ``workers``."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stego")
+
+
+def map_ordered(function: Callable, items: Iterable, workers: int = 1) -> list:
+    """Applies ``function`` to every item, in threads when ``workers`` > 1.
+
+    Results are returned in the order of ``items``. Tasks must not submit
+    work to the pool themselves, as nested waits could exhaust it.
+    """
+    items = list(items)
+    workers = resolve_workers(workers)
+    if workers == 1 or len(items) < 2:
+        return [function(item) for item in items]
+    return list(get_executor(workers).map(function, items))
+
+
+def chunk_slices(length: int, workers: int) -> list[slice]:
+    """Splits ``range(length)`` into at most ``workers`` contiguous slices.
+
+    The split depends only on its arguments, so results assembled from the
+    chunks do not depend on thread scheduling.
+    """
+    bounds = np.linspace(0, length, min(resolve_workers(workers), length) + 1)
+    bounds = bounds.astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,179 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+import pywt
+
+from stego.core import coder
+from stego.core import lifting
+from stego.core import message as msg_utils
+from stego.core import multichannel_coder
+from stego.core.errors import ConfigError
+
+COEFFICIENTS = ("ad", "da", "dd")
+PRECISIONS = ("float32", "float64")
+
+Layout = namedtuple(
+    "Layout",
+    ["height", "width", "image_capacity", "coefficient_capacity", "indices"],
+)
+
+
+class EncoderPlan:
+    """Encoder parameters validated once, with per-shape work precomputed.
+
+    Takes the keys of the ``[encoder]`` config. The crop, capacities and
+    center gather tables of every image shape, and the dispatched payload of
+    every message, are computed on first use and reused afterwards, so
+    ``encode`` and ``decode`` only do the array work.
+    """
+
+    def __init__(
+        self,
+        *,
+        coefficients: list[str],
+        alpha: float = 1,
+        block_size: int = 3,
+        level: int = 2,
+        wavelet: str = "haar",
+        color_space: str,
+        use_channels: list[int],
+        ecc_symbols: int,
+        precision: str = "float64",
+        workers: int = 1,
+        message: bytes | None = None,
+        **kwargs,
+    ):
+        self.parameters = {
+            "coefficients": list(coefficients),
+            "alpha": alpha,
+            "block_size": block_size,
+            "level": level,
+            "wavelet": wavelet,
+            "ecc_symbols": ecc_symbols,
+            "precision": precision,
+            "workers": workers,
+        }
+        self.color_space = color_space
+        self.use_channels = list(use_channels)
+        self.message = message
+        self.validate()
+
+        self.unit = block_size * 2**level
+        self.to_color_space = multichannel_coder.color_spaces[color_space]
+        self.to_rgb = multichannel_coder.color_spaces_inversed[color_space]
+        self.codec = msg_utils.get_codec(ecc_symbols)
+        self._layouts = {}
+        self._payloads = {}
+
+    def validate(self):
+        """Raises ``ConfigError`` for parameters the coder cannot use."""
+        parameters = self.parameters
+        if not parameters["coefficients"] or not set(
+            parameters["coefficients"]
+        ).issubset(COEFFICIENTS):
+            raise ConfigError(f"Coefficients must be a subset of {COEFFICIENTS}")
+        if len(set(parameters["coefficients"])) != len(parameters["coefficients"]):
+            raise ConfigError("Coefficients must not repeat")
+        if parameters["alpha"] <= 0:
+            raise ConfigError("Alpha must be positive")
+        if parameters["block_size"] < 2:
+            raise ConfigError("Block size must be at least 2")
+        if parameters["level"] < 1:
+            raise ConfigError("Level must be at least 1")
+        if parameters["wavelet"] not in (
+            [lifting.WAVELET] + pywt.wavelist(kind="discrete")
+        ):
+            raise ConfigError(f"Unknown wavelet: {parameters['wavelet']}")
+        if self.color_space not in multichannel_coder.color_spaces:
+            raise ConfigError(f"Unknown color space: {self.color_space}")
+        if not self.use_channels or not set(self.use_channels).issubset(range(3)):
+            raise ConfigError("Channels must be a subset of [0, 1, 2]")
+        if len(set(self.use_channels)) != len(self.use_channels):
+            raise ConfigError("Channels must not repeat")
+        if not 0 < parameters["ecc_symbols"] < 255:
+            raise ConfigError("Number of ECC symbols must be between 1 and 254")
+        if parameters["precision"] not in PRECISIONS:
+            raise ConfigError(f"Precision must be one of {PRECISIONS}")
+        if parameters["workers"] < 0:
+            raise ConfigError("Number of workers must not be negative")
+
+    def layout(self, shape: tuple) -> Layout:
+        """Returns the crop, capacities and center gather tables of a shape.
+
+        The gather tables are those ``coder.center_indices`` caches for the
+        encoder, so computing them here also prepares the encoder.
+        """
+        key = tuple(shape[:2])
+        if key not in self._layouts:
+            height, width = (length // self.unit * self.unit for length in key)
+            # Capacity only depends on the shape, an empty stand-in is enough.
+            image_capacity, coefficient_capacity = coder.get_capacity(
+                np.empty((height, width, 0)), **self.parameters
+            )
+            block_size = self.parameters["block_size"]
+            indices = coder.center_indices(
+                width // self.unit, block_size, coefficient_capacity * coder.BYTE
+            )
+            self._layouts[key] = Layout(
+                height, width, image_capacity, coefficient_capacity, indices
+            )
+        return self._layouts[key]
+
+    def payload(self, layout: Layout, message: bytes | None = None) -> np.ndarray:
+        """Returns the (bands, bytes) dispatched ECC payload of a message."""
+        message = self.message if message is None else message
+        if message is None:
+            raise ValueError("No message to encode")
+        key = layout.height, layout.width, bytes(message)
+        if key not in self._payloads:
+            ecc_message = self.codec.encode(message)
+            parts = coder.message_dispatcher(
+                np.empty((layout.height, layout.width, 0)),
+                ecc_message,
+                **self.parameters,
+            )
+            payload = np.stack([np.frombuffer(part, dtype=np.uint8) for part in parts])
+            payload.flags.writeable = False
+            self._payloads[key] = payload
+        return self._payloads[key]
+
+    def encode(
+        self, image: np.ndarray, message: bytes | None = None
+    ) -> (np.ndarray, np.ndarray, bytes):
+        """Encodes a message into an RGB image, like ``encode_color_image``.
+
+        Uses the message of the plan when ``message`` is not given.
+        """
+        layout = self.layout(image.shape)
+        payload = self.payload(layout, message)
+        image = image[: layout.height, : layout.width]
+
+        channels = self.convert(image, self.to_color_space).copy()
+        channels[:, :, self.use_channels] = coder.encode(
+            channels[:, :, self.use_channels], payload, **self.parameters
+        )
+        stego = self.convert(channels, self.to_rgb)
+        return image, stego, payload.tobytes()
+
+    def decode(self, image: np.ndarray) -> (bytearray | None, bytes, bytes):
+        """Decodes a message from an RGB image, like ``decode_color_image``."""
+        layout = self.layout(image.shape)
+        channels = self.convert(image, self.to_color_space)
+        margins = coder.extract_margins(
+            channels[:, :, self.use_channels], **self.parameters
+        )
+        soft_bits = coder.soft_payload(margins, layout.coefficient_capacity)
+        message_raw = np.packbits(soft_bits > 0, axis=-1).tobytes()
+
+        message, ecc_message = msg_utils.decode_soft_bits(
+            soft_bits, self.parameters["ecc_symbols"]
+        )
+        return message, ecc_message, message_raw
+
+    @staticmethod
+    def convert(image: np.ndarray, code: int | None) -> np.ndarray:
+        """Converts an image with a code such as ``to_color_space``, None keeps it."""
+        if code is None:
+            return image
+        return cv2.cvtColor(image, code)
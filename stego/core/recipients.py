@@ -0,0 +1,231 @@
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+from stego.core import message as msg_utils
+
+# Bytes of the substrings of multi-index hashing, and the bits a substring
+# may differ by and still be looked up.
+SUBSTRING_BYTES = 2
+SUBSTRING_RADIUS = 1
+
+# Words of per-byte bit counts, at most 8 each, that fit one byte when added.
+WORDS_PER_SUM = 31
+
+# Substrings that look up more than this fraction of all codes, e.g. bytes
+# that most IDs share, are not used.
+MAX_CANDIDATE_FRACTION = 1 / 16
+
+Match = namedtuple("Match", ["message", "distance", "margin"])
+
+
+def as_words(codes: np.ndarray) -> np.ndarray:
+    """Returns (rows, bytes) uint8 codes zero-padded to (words, rows) uint64.
+
+    Every word is contiguous over the rows, so distances are computed word
+    by word on whole arrays.
+    """
+    padding = -codes.shape[1] % 8
+    padded = np.ascontiguousarray(np.pad(codes, ((0, 0), (0, padding))))
+    return np.ascontiguousarray(padded.view(np.uint64).T)
+
+
+def distances(words: np.ndarray, code: np.ndarray) -> np.ndarray:
+    """Returns the Hamming distances of (words, rows) codes to a (words, 1) code.
+
+    Bits are counted in parallel within every word, in 2, 4 and 8 bit
+    fields. The byte counts of up to ``WORDS_PER_SUM`` words are added
+    before the bytes of the sum are, by one multiplication.
+    """
+    totals = np.zeros(words.shape[1], dtype=np.uint64)
+    for start in range(0, len(words), WORDS_PER_SUM):
+        counts = np.zeros(words.shape[1], dtype=np.uint64)
+        for word, query in zip(words[start : start + WORDS_PER_SUM], code[start:]):
+            bits = word ^ query
+            bits -= (bits >> np.uint64(1)) & np.uint64(0x5555555555555555)
+            bits = (bits & np.uint64(0x3333333333333333)) + (
+                (bits >> np.uint64(2)) & np.uint64(0x3333333333333333)
+            )
+            bits += bits >> np.uint64(4)
+            bits &= np.uint64(0x0F0F0F0F0F0F0F0F)
+            counts += bits
+        counts *= np.uint64(0x0101010101010101)
+        totals += counts >> np.uint64(56)
+    return totals.astype(np.int64)
+
+
+def substring_keys(codes: np.ndarray) -> np.ndarray:
+    """Returns (rows, substrings) integer keys of ``SUBSTRING_BYTES`` byte slices."""
+    keys = []
+    for start in range(0, codes.shape[1], SUBSTRING_BYTES):
+        key = np.zeros(len(codes), dtype=np.int64)
+        for column in codes[:, start : start + SUBSTRING_BYTES].T:
+            key = key << msg_utils.BYTE | column
+        keys.append(key)
+    return np.stack(keys, axis=1)
+
+
+@lru_cache
+def flip_masks(bits: int, radius: int) -> np.ndarray:
+    """Returns every mask of ``bits`` bits with at most ``radius`` bits set."""
+    masks = [0]
+    for count in range(1, radius + 1):
+        masks += [
+            sum(1 << bit for bit in flips) for flips in combinations(range(bits), count)
+        ]
+    return np.array(masks, dtype=np.int64)
+
+
+class RecipientIndex:
+    """Attributes decoded payloads to registered messages by Hamming distance.
+
+    Every message, e.g. a recipient ID, is stored as the packed bits of its
+    ECC message, which its payload repeats. Queries are the voted ECC message
+    of a copy, or its raw payload, and find the closest message even when
+    error correction fails. All messages must have the same length.
+
+    Multi-index hashing splits the codes into substrings of
+    ``SUBSTRING_BYTES``. A code less than ``(SUBSTRING_RADIUS + 1)`` bits
+    per substring from the query has a substring within ``SUBSTRING_RADIUS``
+    bits of the query's, so only codes sharing such a substring are compared.
+    Queries farther from every code scan all codes.
+    """
+
+    def __init__(self, ecc_symbols: int, messages: list[bytes] = ()):
+        self.ecc_symbols = ecc_symbols
+        self.messages = np.empty((0, 0), dtype=np.uint8)
+        self.codes = np.empty((0, 0), dtype=np.uint8)
+        self.words = as_words(self.codes)
+        self._tables = None
+        if len(messages):
+            self.add(messages)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def add(self, messages: list[bytes]) -> None:
+        """Registers messages, encoded in one batch."""
+        lengths = {len(message) for message in messages}
+        if len(self):
+            lengths.add(self.messages.shape[1])
+        if len(lengths) > 1:
+            raise ValueError("All messages must have the same length")
+        batch = np.frombuffer(b"".join(messages), dtype=np.uint8)
+        batch = batch.reshape(len(messages), -1)
+        codes = msg_utils.encode_ecc_batch(batch, self.ecc_symbols)
+        if len(self):
+            batch = np.concatenate([self.messages, batch])
+            codes = np.concatenate([self.codes, codes])
+        self.messages, self.codes = batch, codes
+        self.words = as_words(codes)
+        self._tables = None
+
+    def tables(self) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Returns the sorted keys and rows of every substring, built on first use."""
+        if self._tables is None:
+            keys = substring_keys(self.codes)
+            self._tables = []
+            for column in keys.T:
+                rows = np.argsort(column, kind="stable")
+                self._tables.append((column[rows], rows))
+        return self._tables
+
+    def candidates(self, code: np.ndarray) -> tuple[np.ndarray, int]:
+        """Returns the rows sharing a substring with ``code``, and their reach.
+
+        Substrings match within ``SUBSTRING_RADIUS`` bits. Substrings that
+        would look up more than ``MAX_CANDIDATE_FRACTION`` of all rows, such as
+        bytes every ID shares, are skipped. Every row within the returned
+        distance of ``code`` is a candidate, as it matches at least one of
+        the substrings used.
+        """
+        keys = substring_keys(code[np.newaxis])[0]
+        ranges = []
+        for start, key, (sorted_keys, table_rows) in zip(
+            range(0, len(code), SUBSTRING_BYTES), keys, self.tables()
+        ):
+            bits = len(code[start : start + SUBSTRING_BYTES]) * msg_utils.BYTE
+            probes = key ^ flip_masks(bits, SUBSTRING_RADIUS)
+            lows = np.searchsorted(sorted_keys, probes, side="left")
+            highs = np.searchsorted(sorted_keys, probes, side="right")
+            if (highs - lows).sum() <= MAX_CANDIDATE_FRACTION * len(self):
+                ranges.append((table_rows, lows, highs))
+        reach = len(ranges) * (SUBSTRING_RADIUS + 1) - 1
+        rows = [
+            table_rows[low:high]
+            for table_rows, lows, highs in ranges
+            for low, high in zip(lows, highs)
+        ]
+        if not rows:
+            return np.empty(0, dtype=np.int64), reach
+        return np.unique(np.concatenate(rows)), reach
+
+    def query(self, ecc_message: bytes) -> Match | None:
+        """Returns the closest registered message to a voted ECC message.
+
+        ``distance`` is in bits, and ``margin`` is how many bits farther the
+        next closest message is, at least; the margin is all bits of the
+        code when only one message is registered. Returns None when the index
+        is empty.
+        """
+        if not len(self):
+            return None
+        code = np.frombuffer(bytes(ecc_message), dtype=np.uint8)
+        length = self.codes.shape[1]
+        code = np.pad(code[:length], (0, max(length - len(code), 0)))
+        words = as_words(code[np.newaxis])[:, 0]
+
+        rows, reach = self.candidates(code)
+        bound = reach + 1
+        if len(rows):
+            row_distances = distances(self.words[:, rows], words)
+        if not len(rows) or row_distances.min() >= bound:
+            rows = np.arange(len(self))
+            row_distances = distances(self.words, words)
+            bound = length * msg_utils.BYTE
+        order = (
+            np.argpartition(row_distances, 1)[:2]
+            if len(rows) > 2
+            else np.arange(len(rows))
+        )
+        order = order[np.argsort(row_distances[order], kind="stable")]
+        best = row_distances[order[0]]
+        second = row_distances[order[1]] if len(order) > 1 else bound
+        return Match(
+            bytes(self.messages[rows[order[0]]]),
+            int(best),
+            int(min(second, bound) - best),
+        )
+
+    def query_raw(self, message_raw: bytes, copies: int = 1) -> Match | None:
+        """Returns the closest registered message to a raw decoded payload.
+
+        ``message_raw`` holds ``copies`` payloads, e.g. the raw payload of
+        ``decode_color_image`` with one copy per used channel; it is voted
+        over every repetition first. Hard bits lose the margins the soft vote
+        of ``decode_color_image`` weighs, so prefer ``query`` with its ECC
+        message, decoded with ``ecc_length`` set to the length of the codes.
+        """
+        period = self.codes.shape[1] + 1
+        return self.query(msg_utils.majority_vote(message_raw, period, copies)[:-1])
+
+    def save(self, path: str | Path) -> None:
+        """Writes the messages and codes to an ``.npz`` file."""
+        np.savez(
+            path,
+            ecc_symbols=self.ecc_symbols,
+            messages=self.messages,
+            codes=self.codes,
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RecipientIndex":
+        """Reads an index written by ``save``."""
+        with np.load(path) as data:
+            index = cls(int(data["ecc_symbols"]))
+            index.messages, index.codes = data["messages"], data["codes"]
+        index.words = as_words(index.codes)
+        return index
@@ -0,0 +1,187 @@
+import cv2
+import numpy as np
+
+from stego.core import coder
+from stego.core import haar
+from stego.core import multichannel_coder
+from stego.core import resync
+from stego.core.errors import ConfigError
+
+# Sides, in pixels of the level - 1 approximation, of the top-left windows
+# that all candidate sizes, and then the best ``RESCORED_CANDIDATES``, are
+# scored on.
+COARSE_WINDOW = 128
+FINE_WINDOW = 512
+RESCORED_CANDIDATES = 8
+
+# Candidate sizes that are fully decoded, best scored first.
+DECODED_CANDIDATES = 3
+
+
+def image_pyramid(channel: np.ndarray, min_size: int) -> list[np.ndarray]:
+    """Returns a channel and its halvings, down to ``min_size`` pixels."""
+    pyramid = [channel.astype(np.float32)]
+    while min(pyramid[-1].shape[:2]) // 2 >= min_size:
+        height, width = pyramid[-1].shape[:2]
+        pyramid.append(
+            cv2.resize(
+                pyramid[-1], (width // 2, height // 2), interpolation=cv2.INTER_AREA
+            )
+        )
+    return pyramid
+
+
+def resample_window(
+    pyramid: list[np.ndarray], scale_y: float, scale_x: float, shape: tuple
+) -> np.ndarray:
+    """Returns the top-left ``shape`` of the channel scaled by the factors.
+
+    The level of the pyramid that scales up the least, or down by less than
+    two, is resampled, so every scale costs about as much as the window.
+    """
+    index = 0
+    while index + 1 < len(pyramid) and max(scale_y, scale_x) * 2 ** (index + 1) < 1:
+        index += 1
+    source = pyramid[index]
+    scale_y, scale_x = scale_y * 2**index, scale_x * 2**index
+    # Pixel centers map to pixel centers.
+    matrix = np.array(
+        [[scale_x, 0, (scale_x - 1) / 2], [0, scale_y, (scale_y - 1) / 2]]
+    )
+    return cv2.warpAffine(
+        source,
+        matrix,
+        (shape[1], shape[0]),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_REFLECT,
+    )
+
+
+def size_score(
+    pyramid: list[np.ndarray],
+    height: int,
+    width: int,
+    *,
+    coefficients: list[str],
+    block_size: int,
+    level: int,
+    window: int = COARSE_WINDOW,
+) -> float:
+    """Returns how much the block grid of a channel resized to a size stands out.
+
+    That is the ``resync.margin_statistic`` of the grid over the mean of the
+    other grid offsets, as resampling alone changes the statistic. Level
+    detail bands are one Haar step of the level - 1 approximation, which is
+    resampled directly instead of the full-size image.
+    """
+    size = 2 ** (level - 1)
+    window = 2 * block_size * max(window // (2 * block_size), 1)
+    shape = min(height // size, window), min(width // size, window)
+    source_height, source_width = pyramid[0].shape[:2]
+    approximation = resample_window(
+        pyramid, height / size / source_height, width / size / source_width, shape
+    )
+    bands = haar.detail_bands(approximation, 1, coefficients)
+    stacked = coder.stack_bands(bands, coefficients)
+    scores = resync.offset_scores(stacked, block_size)
+    return scores[0, 0] - (scores.sum() - scores[0, 0]) / (scores.size - 1)
+
+
+def candidate_sizes(
+    shape: tuple, unit: int, min_scale: float, max_scale: float
+) -> list[tuple[int, int]]:
+    """Returns the (height, width) multiples of ``unit`` the image may come from.
+
+    Widths cover the scale range; heights keep the aspect ratio.
+    """
+    height, width = shape[:2]
+    widths = range(
+        max(int(np.ceil(width * min_scale / unit)), 1),
+        int(width * max_scale // unit) + 1,
+    )
+    return [
+        (max(round(height * columns / width), 1) * unit, columns * unit)
+        for columns in widths
+    ]
+
+
+def decode_color_image(
+    image: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    min_scale: float = 0.5,
+    max_scale: float = 4,
+    **parameters,
+) -> (bytearray | None, bytes, tuple[int, int]):
+    """Decodes a message from a color image resized by an unknown factor.
+
+    Encoded images are multiples of ``block_size * 2**level`` in size, so
+    sizes are searched in those steps between ``min_scale`` and
+    ``max_scale`` times the image, coarse to fine: every size is scored on a
+    small window of a pyramid of the first channel, the best are rescored
+    on a larger window with one step of height either way, and only the
+    best ``DECODED_CANDIDATES`` are resized and decoded.
+    Returns the message (None when error correction fails), the ECC message
+    and the (height, width) decoded. Sizes are scored on Haar bands, so only
+    the Haar wavelet is supported.
+    """
+    if wavelet != "haar":
+        raise ConfigError("Rescaling only supports the Haar wavelet")
+    parameters.update(
+        coefficients=coefficients,
+        block_size=block_size,
+        level=level,
+        wavelet=wavelet,
+        color_space=color_space,
+        use_channels=use_channels,
+    )
+    unit = block_size * 2**level
+    channel = multichannel_coder.rgb_to_color_space(image, color_space)[
+        :, :, use_channels[0]
+    ]
+    pyramid = image_pyramid(channel, COARSE_WINDOW)
+
+    def best(sizes: list[tuple[int, int]], count: int, window: int) -> list:
+        scores = [
+            size_score(
+                pyramid,
+                *size,
+                coefficients=coefficients,
+                block_size=block_size,
+                level=level,
+                window=window,
+            )
+            for size in sizes
+        ]
+        order = np.argsort(scores, kind="stable")[::-1][:count]
+        return [sizes[index] for index in order]
+
+    sizes = candidate_sizes(image.shape, unit, min_scale, max_scale)
+    sizes = best(sizes, RESCORED_CANDIDATES, COARSE_WINDOW)
+    sizes = sorted(
+        {
+            (height + step * unit, width)
+            for height, width in sizes
+            for step in (-1, 0, 1)
+            if height + step * unit > 0
+        }
+    )
+    best_sizes = best(sizes, DECODED_CANDIDATES, FINE_WINDOW)
+
+    ecc_message = b""
+    for height, width in best_sizes:
+        resized = image
+        if resized.shape[:2] != (height, width):
+            resized = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+        message, candidate_ecc_message, _ = multichannel_coder.decode_color_image(
+            resized, **parameters
+        )
+        if message is not None:
+            return message, candidate_ecc_message, (height, width)
+        ecc_message = ecc_message or candidate_ecc_message
+    return None, ecc_message, best_sizes[0] if best_sizes else image.shape[:2]
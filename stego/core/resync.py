@@ -0,0 +1,363 @@
+import numpy as np
+from reedsolo import ReedSolomonError
+
+from stego.core import coder
+from stego.core import haar
+from stego.core import kernels
+from stego.core import message as msg_utils
+from stego.core import multichannel_coder
+from stego.core.errors import ConfigError
+
+BYTE = 8
+
+# Rotations of the voted payload that error correction tries, those whose
+# separator byte is the most clearly zero first.
+MAX_ROTATIONS = 8
+
+# Side, in pixels, of the top-left window of the first channel that grid
+# offsets are scored on. Its thousands of blocks are plenty for the
+# statistic and keep the search cheaper than a decode.
+OFFSET_WINDOW = 1024
+
+# Strongest autocorrelation lags that candidate payload periods come from.
+CANDIDATE_LAGS = 12
+
+
+def integral_image(image: np.ndarray) -> np.ndarray:
+    """Returns the (height + 1, width + 1, ...) summed-area table of an image."""
+    table = np.zeros(
+        (image.shape[0] + 1, image.shape[1] + 1) + image.shape[2:], dtype=np.float64
+    )
+    np.cumsum(image, axis=0, dtype=np.float64, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_sums(table: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Returns the sums of the boxes between consecutive ``rows`` and ``cols``."""
+    corners = table[rows][:, cols]
+    return corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+
+
+def shifted_detail_bands(
+    table: np.ndarray,
+    offset_y: int,
+    offset_x: int,
+    level: int,
+    coefficients: list[str],
+) -> dict[str, np.ndarray]:
+    """Returns the Haar detail bands of an image cropped by an offset.
+
+    ``table`` is the ``integral_image`` of the uncropped image, so every
+    offset costs one gather of quadrant sums instead of a decomposition.
+    """
+    size = 2**level
+    half = size // 2
+    height = (table.shape[0] - 1 - offset_y) // size
+    width = (table.shape[1] - 1 - offset_x) // size
+    rows = offset_y + half * np.arange(2 * height + 1)
+    cols = offset_x + half * np.arange(2 * width + 1)
+    sums = box_sums(table, rows, cols)
+    quadrants = sums.reshape((height, 2, width, 2) + sums.shape[2:]) / size
+    return haar.combine_quadrants(quadrants, coefficients)
+
+
+def margin_statistic(margins: np.ndarray) -> float:
+    """Returns the mean absolute margin over the root mean square margin.
+
+    Embedded margins are close to +/-A and score close to 1, natural ones
+    are peaked at zero and score about 0.7. ``margins`` is (blocks, ...),
+    the statistic is averaged over the trailing axes.
+    """
+    magnitude = np.abs(margins).mean(axis=0)
+    power = np.square(margins).mean(axis=0)
+    return float(
+        np.mean(magnitude / np.sqrt(np.maximum(power, np.finfo(np.float64).tiny)))
+    )
+
+
+def offset_scores(bands: np.ndarray, block_size: int) -> np.ndarray:
+    """Returns the ``margin_statistic`` of every block grid offset of the bands.
+
+    ``bands`` is (height, width, ...), the result (block_size, block_size).
+    """
+    center = block_size // 2
+    table = integral_image(bands)
+    sums = (
+        table[block_size:, block_size:]
+        - table[:-block_size, block_size:]
+        - table[block_size:, :-block_size]
+        + table[:-block_size, :-block_size]
+    )
+    centers = bands[center : center + sums.shape[0], center : center + sums.shape[1]]
+    margins = kernels.center_margins(sums, centers, block_size)
+
+    scores = np.zeros((block_size, block_size))
+    for row in range(block_size):
+        for col in range(block_size):
+            grid_margins = margins[row::block_size, col::block_size]
+            if grid_margins.size:
+                scores[row, col] = margin_statistic(
+                    grid_margins.reshape((-1,) + grid_margins.shape[2:])
+                )
+    return scores
+
+
+def find_offset(
+    channels: np.ndarray, *, coefficients: list[str], block_size: int, level: int
+) -> tuple[int, int]:
+    """Returns the crop (rows, columns) that realigns the block grid.
+
+    Every offset below ``block_size * 2**level`` is scored with
+    ``offset_scores``. Offsets that are equal modulo ``2**level`` share their
+    detail bands, which come from one summed-area table of the image.
+    """
+    size = 2**level
+    unit = block_size * size
+    table = integral_image(channels)
+    scores = np.zeros((unit, unit))
+    for offset_y in range(size):
+        for offset_x in range(size):
+            bands = shifted_detail_bands(table, offset_y, offset_x, level, coefficients)
+            scores[offset_y::size, offset_x::size] = offset_scores(
+                coder.stack_bands(bands, coefficients), block_size
+            )
+    offset_y, offset_x = np.unravel_index(np.argmax(scores), scores.shape)
+    return int(offset_y), int(offset_x)
+
+
+def lag_correlations(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the prominence and overlap of every 2-D lag of block grids.
+
+    ``values`` is (copies, rows, columns); lags are (row lag, column lag)
+    with row lags from 0 and column lags from ``1 - columns``. As in
+    ``msg_utils.signal_period``, the correlation of a lag is reduced by that
+    of the lags one byte before and after it in the bit stream, so runs of
+    equal bytes and biased bits do not stand out.
+    """
+    copies, rows, cols = values.shape
+    values = values - values.mean(axis=(1, 2), keepdims=True)
+    spectrum = np.fft.rfft2(values, s=(2 * rows, 2 * cols))
+    products = np.fft.irfft2(np.abs(spectrum) ** 2, s=(2 * rows, 2 * cols))
+    col_lags = np.arange(1 - cols, cols)
+    products = products.sum(axis=0)[:rows][:, col_lags]
+    overlap = copies * np.outer(rows - np.arange(rows), cols - np.abs(col_lags))
+    variance = max(np.square(values).mean(), np.finfo(np.float64).tiny)
+    correlation = products / variance / np.maximum(overlap, 1)
+
+    # Lags without a neighbour inside the grid compare to the other one.
+    padded = np.pad(correlation, ((0, 0), (BYTE, BYTE)), constant_values=np.nan)
+    before, after = padded[:, : -2 * BYTE], padded[:, 2 * BYTE :]
+    neighbours = np.where(
+        np.isnan(before), after, np.where(np.isnan(after), before, (before + after) / 2)
+    )
+    neighbours = np.nan_to_num(neighbours)
+    prominence = correlation - np.maximum(neighbours, 0)
+    prominence[0, cols - 1] = overlap[0, cols - 1] = 0
+    return prominence, overlap
+
+
+def candidate_periods(
+    z_scores: np.ndarray, min_period: int, max_period: int
+) -> list[int]:
+    """Returns the periods, in bytes, of lattices through the strongest lags.
+
+    Two lags on the lattice of a period span a sublattice, so the period in
+    bits divides the determinant of every such pair; a lag along the rows
+    is a multiple of the period itself.
+    """
+    rows, lags = z_scores.shape
+    cols = (lags + 1) // 2
+    z_scores = z_scores.copy()
+    z_scores[0, : cols - 1] = -np.inf
+    strongest = np.argsort(z_scores, axis=None)[::-1][:CANDIDATE_LAGS]
+    row_lags, col_lags = np.unravel_index(strongest, z_scores.shape)
+    col_lags = col_lags - (cols - 1)
+
+    determinants = set(np.abs(col_lags[row_lags == 0]).tolist())
+    for first in range(len(strongest)):
+        for second in range(first + 1, len(strongest)):
+            determinants.add(
+                abs(
+                    int(row_lags[first]) * int(col_lags[second])
+                    - int(row_lags[second]) * int(col_lags[first])
+                )
+            )
+    periods = set()
+    for determinant in determinants:
+        if determinant % BYTE:
+            continue
+        bytes_ = determinant // BYTE
+        periods.update(
+            period
+            for period in range(min_period, min(bytes_, max_period) + 1)
+            if bytes_ % period == 0
+        )
+    return sorted(periods)
+
+
+def grid_period(values: np.ndarray, min_period: int = 2) -> tuple[int, int] | None:
+    """Estimates the payload period, in bytes, and the row shift of block grids.
+
+    ``values`` is (copies, rows, columns) of soft bits. Cropping columns
+    breaks the embedded rows, but block (row, column) still holds payload
+    bit ``row * shift + column + start`` modulo the period in bits, so the
+    2-D autocorrelation peaks on a lattice. Lattices through the strongest
+    peaks are scored on all lags, and the one that stands out the most is
+    returned, or None when no period stands out.
+    """
+    copies, rows, cols = values.shape
+    max_period = rows * cols // BYTE // 2
+    if max_period < min_period:
+        return None
+    prominence, overlap = lag_correlations(values)
+    weights = prominence * overlap
+    z_scores = prominence * np.sqrt(overlap)
+
+    row_lags = np.arange(rows)[:, np.newaxis]
+    col_lags = np.arange(1 - cols, cols)
+    best = -np.inf, None
+    for period in candidate_periods(z_scores, min_period, max_period):
+        bits = period * BYTE
+        folded = (row_lags * bits + col_lags % bits).ravel()
+        sums, counts = (
+            np.bincount(folded, array.ravel(), rows * bits).reshape(rows, bits)
+            for array in (weights, overlap)
+        )
+        # Lag (row, column) is on the lattice of a shift when
+        # row * shift + column is a multiple of the period.
+        residues = -row_lags * np.arange(bits) % bits
+        sums = np.take_along_axis(sums, residues, axis=1).sum(axis=0)
+        counts = np.take_along_axis(counts, residues, axis=1).sum(axis=0)
+        lattice_scores = sums / np.sqrt(np.maximum(counts, 1))
+        shift = int(np.argmax(lattice_scores))
+        if lattice_scores[shift] > best[0]:
+            best = lattice_scores[shift], (period, shift)
+    if best[0] < msg_utils.MIN_PERIOD_Z_SCORE:
+        return None
+    return best[1]
+
+
+def phase_votes(
+    values: np.ndarray, period: int, shift: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns per-bit sums and sums of squares of (copies, rows, columns) grids.
+
+    Copies start at different bits of the payload, so each is rotated onto
+    the first by circular cross-correlation before summing. The result
+    starts at an unknown bit of the payload.
+    """
+    bits = period * BYTE
+    copies, rows, cols = values.shape
+    phases = ((np.arange(rows)[:, np.newaxis] * shift + np.arange(cols)) % bits).ravel()
+    sums = np.stack([np.bincount(phases, copy.ravel(), bits) for copy in values])
+    squares = np.stack(
+        [np.bincount(phases, np.square(copy).ravel(), bits) for copy in values]
+    )
+
+    spectra = np.fft.rfft(sums)
+    correlations = np.fft.irfft(np.conj(spectra[:1]) * spectra, n=bits)
+    rotations = np.argmax(correlations, axis=1)
+    total_sums = sum(
+        np.roll(copy, -rotation) for copy, rotation in zip(sums, rotations)
+    )
+    total_squares = sum(
+        np.roll(copy, -rotation) for copy, rotation in zip(squares, rotations)
+    )
+    return total_sums, total_squares
+
+
+def decode_rotations(
+    sums: np.ndarray, squares: np.ndarray, ecc_symbols: int
+) -> tuple[bytearray | None, bytes]:
+    """Error-corrects the payload voted by ``phase_votes`` at likely rotations.
+
+    The payload is the ECC message and a zero byte, so rotations are tried
+    in the order of how negative their last eight soft bits are. Returns the
+    message, None when no rotation decodes, and the ECC message.
+    """
+    bits = sums.size
+    window = np.concatenate([sums, sums[: BYTE - 1]])
+    separator = np.convolve(window, np.ones(BYTE), mode="valid")
+    # The separator starts BYTE bits before the end of a rotated payload.
+    order = np.argsort(np.roll(separator, BYTE), kind="stable")
+
+    first_message = None
+    for rotation in order[:MAX_ROTATIONS]:
+        rotated = np.roll(sums, -rotation)
+        ecc_message = np.packbits(rotated > 0).tobytes()[:-1]
+        reliabilities = msg_utils.byte_reliabilities(
+            rotated, np.roll(squares, -rotation)
+        )[:-1]
+        if first_message is None:
+            first_message = ecc_message
+        if len(ecc_message) <= ecc_symbols:
+            continue
+        try:
+            message, message_ecc, _ = msg_utils.decode_ecc_with_erasures(
+                ecc_message, reliabilities, ecc_symbols
+            )
+        except ReedSolomonError:
+            continue
+        return (message if message else message_ecc), ecc_message
+    return None, first_message or b""
+
+
+def decode_color_image(
+    image: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
+    **kwargs,
+) -> (bytearray | None, bytes, tuple[int, int]):
+    """Decodes a message from a color image cropped by an unknown amount.
+
+    The block grid is realigned with ``find_offset``, and the payload is
+    voted along the lattice of ``grid_period``, so crops on any side work as
+    long as the payload repeats at least twice in every band of the crop.
+    Only Haar is supported. Returns the message (None when error correction
+    fails), the ECC message and the (rows, columns) offset of the grid.
+    """
+    if wavelet != "haar":
+        raise ConfigError("Resynchronization only supports the Haar wavelet")
+    parameters = {
+        "coefficients": coefficients,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "precision": precision,
+        "workers": workers,
+    }
+
+    channels = multichannel_coder.rgb_to_color_space(image, color_space)
+    channels = channels[:, :, use_channels]
+    offset_y, offset_x = find_offset(
+        channels[:OFFSET_WINDOW, :OFFSET_WINDOW, 0],
+        coefficients=coefficients,
+        block_size=block_size,
+        level=level,
+    )
+
+    unit = block_size * 2**level
+    rows = (channels.shape[0] - offset_y) // unit
+    cols = (channels.shape[1] - offset_x) // unit
+    aligned = channels[
+        offset_y : offset_y + rows * unit, offset_x : offset_x + cols * unit
+    ]
+    margins = coder.extract_margins(aligned, **parameters)
+    values = (margins * coder.band_weights(margins)).sum(axis=1)
+    values = np.moveaxis(values, 0, -1).reshape(len(coefficients), rows, cols)
+
+    estimate = grid_period(values)
+    if estimate is None:
+        return None, b"", (offset_y, offset_x)
+    sums, squares = phase_votes(values, *estimate)
+    message, ecc_message = decode_rotations(sums, squares, ecc_symbols)
+    return message, ecc_message, (offset_y, offset_x)
@@ -0,0 +1,163 @@
+import itertools
+import threading
+
+import numpy as np
+
+from stego.core import blocking
+from stego.core import coder
+from stego.core import haar
+from stego.core import message as msg_utils
+from stego.core import multichannel_coder
+from stego.core import parallel
+
+COEFFICIENTS = ["ad", "da", "dd"]
+
+
+def candidate_grid(**options: list) -> list[dict]:
+    """Returns every combination of parameter options as encoder configs.
+
+    ``candidate_grid(level=[2, 3], block_size=[3, 5], ...)`` gives the four
+    configs in the order of ``itertools.product``.
+    """
+    names = list(options)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(options[name] for name in names))
+    ]
+
+
+def decomposition_key(candidate: dict, shape: tuple) -> tuple:
+    """Returns what the detail bands of a candidate depend on.
+
+    Block sizes, bands and channel subsets only select from the bands. The
+    closed-form Haar bands can differ from the pywt ones at odd edges, so
+    which of the two a block size uses is part of the key.
+    """
+    level = candidate.get("level", 2)
+    wavelet = candidate.get("wavelet", "haar")
+    closed_form = wavelet == "haar" and haar.supports(
+        shape, level, candidate.get("block_size", 3)
+    )
+    return (
+        candidate["color_space"],
+        wavelet,
+        level,
+        candidate.get("precision", "float64"),
+        closed_form,
+    )
+
+
+def geometry_key(candidate: dict) -> tuple:
+    """Returns the parameters of a candidate other than ``ecc_symbols``."""
+    return tuple(
+        (name, str(value))
+        for name, value in sorted(candidate.items())
+        if name != "ecc_symbols"
+    )
+
+
+def decode_candidate(
+    margins: np.ndarray, image: np.ndarray, candidate: dict
+) -> tuple[bytearray | None, bytes]:
+    """Decodes the margins of a candidate, like ``decode_color_image``.
+
+    ``margins`` are the (blocks, channels, bands) margins of all channels and
+    bands. Returns the message, None when error correction fails, and the
+    voted ECC message.
+    """
+    bands = [
+        COEFFICIENTS.index(coefficient) for coefficient in candidate["coefficients"]
+    ]
+    selected = margins[:, candidate["use_channels"]][..., bands]
+
+    _, coefficient_capacity = coder.get_capacity(image, **candidate)
+    soft_bits = coder.soft_payload(selected, coefficient_capacity)
+    return msg_utils.decode_soft_bits(soft_bits, candidate["ecc_symbols"])
+
+
+def search_decode(
+    image: np.ndarray, candidates: list[dict], *, workers: int = 1
+) -> tuple[bytearray | None, dict | None]:
+    """Decodes an image whose encoder config is one of ``candidates``.
+
+    Candidates are grouped by color space, wavelet, level and precision;
+    every group converts and decomposes the image once, measures the block
+    margins of all channels and bands once per block size, and only votes and
+    error-corrects per candidate, in candidate order. Groups run in
+    ``workers`` threads; once a candidate decodes, groups skip the
+    candidates after it.
+
+    A codeword with more ECC symbols is also a codeword with fewer, so a
+    candidate decoding its parity bytes as part of the message does not tell
+    which ``ecc_symbols`` were used. Once a candidate decodes, candidates
+    that differ from it only by more ``ecc_symbols`` are tried, most first,
+    and the first of them that decodes is returned instead.
+
+    Returns the message and the config that decoded it, the earliest in
+    candidate order up to ``ecc_symbols``, or (None, None).
+    """
+    groups = {}
+    for index, candidate in enumerate(candidates):
+        key = decomposition_key(candidate, image.shape)
+        groups.setdefault(key, []).append((index, candidate))
+
+    converted = {
+        color_space: multichannel_coder.rgb_to_color_space(image, color_space)
+        for color_space, *_ in groups
+    }
+    lock = threading.Lock()
+    found = [len(candidates)]
+
+    def search_group(group: list[tuple[int, dict]]) -> tuple | None:
+        if group[0][0] > found[0]:
+            return None
+        first = group[0][1]
+        bands = coder.detail_bands(
+            converted[first["color_space"]],
+            coefficients=COEFFICIENTS,
+            block_size=first.get("block_size", 3),
+            level=first.get("level", 2),
+            wavelet=first.get("wavelet", "haar"),
+            precision=first.get("precision", "float64"),
+        )
+        stacked = coder.stack_bands(bands, COEFFICIENTS)
+
+        margins = {}
+        for index, candidate in group:
+            # Candidates of a group are in candidate order.
+            if index > found[0]:
+                return None
+            block_size = candidate.get("block_size", 3)
+            if block_size not in margins:
+                margins[block_size] = coder.block_margins(
+                    blocking.block_view(stacked, block_size)
+                )
+            message, _ = decode_candidate(margins[block_size], image, candidate)
+            if message is None:
+                continue
+            larger = sorted(
+                (
+                    other
+                    for _, other in group
+                    if geometry_key(other) == geometry_key(candidate)
+                    and other["ecc_symbols"] > candidate["ecc_symbols"]
+                ),
+                key=lambda other: other["ecc_symbols"],
+                reverse=True,
+            )
+            for other in larger:
+                other_message, _ = decode_candidate(margins[block_size], image, other)
+                if other_message is not None:
+                    message, candidate = other_message, other
+                    break
+            with lock:
+                found[0] = min(found[0], index)
+            return index, message, candidate
+        return None
+
+    results = parallel.map_ordered(search_group, groups.values(), workers)
+    results = [result for result in results if result is not None]
+    if not results:
+        return None, None
+    _, message, candidate = min(results, key=lambda result: result[0])
+    return message, candidate
@@ -0,0 +1,172 @@
+from collections.abc import Iterator
+
+import numpy as np
+
+from stego.core import blocking
+from stego.core import coder
+from stego.core import message as msg_utils
+from stego.core import multichannel_coder
+from stego.core.errors import ConfigError
+
+# Pixels of the image processed at once; strips are at least one row of
+# blocks high whatever the width.
+TILE_PIXELS = 2**21
+
+
+def strip_rows(
+    height: int, width: int, unit: int, tile_pixels: int = TILE_PIXELS
+) -> list[slice]:
+    """Returns the row ranges of strips of whole ``unit`` high block rows."""
+    rows = unit * max(tile_pixels // (width * unit), 1)
+    return [slice(start, min(start + rows, height)) for start in range(0, height, rows)]
+
+
+def check_wavelet(wavelet: str) -> None:
+    """Raises ``ConfigError`` for wavelets whose blocks depend on their neighbours."""
+    if wavelet != "haar":
+        raise ConfigError("Tiled coding only supports the haar wavelet")
+
+
+def encode_strips(
+    image: np.ndarray,
+    message: bytes,
+    *,
+    coefficients: list[str],
+    alpha: float = 1,
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
+    tile_pixels: int = TILE_PIXELS,
+    **kwargs,
+) -> Iterator[tuple[slice, np.ndarray]]:
+    """Encodes a message into an RGB image strip by strip.
+
+    ``image`` only needs to support slicing, e.g. a ``np.memmap``, so only
+    one strip of about ``tile_pixels`` is converted and transformed at a
+    time. Haar blocks of ``block_size * 2**level`` pixels are independent,
+    and the payload of ``message_dispatcher`` fills them in row order, so
+    every strip embeds its own slice of the payload bits. Yields the rows
+    of the cropped image and their stego pixels, equal to those of
+    ``encode_color_image``.
+    """
+    check_wavelet(wavelet)
+    parameters = {
+        "coefficients": coefficients,
+        "alpha": alpha,
+        "block_size": block_size,
+        "level": level,
+        "ecc_symbols": ecc_symbols,
+        "precision": precision,
+        "workers": workers,
+    }
+    unit = block_size * 2**level
+    height, width = blocking.get_new_shape(image, unit)
+    ecc_message = msg_utils.encode_ecc(message, **parameters)
+    parts = coder.message_dispatcher(
+        np.empty((height, width, 0)), ecc_message, **parameters
+    )
+    bits = coder.stacked_bits(parts, 4)
+    blocks_wide = width // unit
+
+    for rows in strip_rows(height, width, unit, tile_pixels):
+        channels = multichannel_coder.rgb_to_color_space(
+            np.ascontiguousarray(image[rows, :width]), color_space
+        ).copy()
+        strip_bits = bits[
+            rows.start // unit * blocks_wide : rows.stop // unit * blocks_wide
+        ]
+        if len(strip_bits):
+            stego = coder.embed_haar_bits(
+                channels[:, :, use_channels], strip_bits, **parameters
+            )
+            channels[:, :, use_channels] = np.clip(stego, 0, 255).astype(np.uint8)
+        yield rows, multichannel_coder.color_space_to_rgb(channels, color_space)
+
+
+def encode_color_image(
+    image: np.ndarray,
+    message: bytes,
+    *,
+    out: np.ndarray | None = None,
+    **parameters,
+) -> np.ndarray:
+    """Encodes a message into an RGB image, writing the stego image to ``out``.
+
+    ``out`` may be a ``np.memmap`` of the cropped shape, so that neither
+    image is ever fully in memory; it is allocated when not given. Takes the
+    keys of the ``[encoder]`` config and ``tile_pixels``, see
+    ``encode_strips``.
+    """
+    unit = parameters.get("block_size", 3) * 2 ** parameters.get("level", 2)
+    height, width = blocking.get_new_shape(image, unit)
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+    for rows, stego in encode_strips(image, message, **parameters):
+        out[rows] = stego
+    return out
+
+
+def decode_color_image(
+    image: np.ndarray,
+    *,
+    coefficients: list[str],
+    block_size: int = 3,
+    level: int = 2,
+    wavelet: str = "haar",
+    color_space: str,
+    use_channels: list[int],
+    ecc_symbols: int,
+    precision: str = "float64",
+    workers: int = 1,
+    ecc_length: int | None = None,
+    tile_pixels: int = TILE_PIXELS,
+    **kwargs,
+) -> (bytearray | None, bytes, bytes):
+    """Decodes a message from an RGB image strip by strip.
+
+    The block margins of every strip are kept until the payload is complete,
+    later strips are not read; the repetitions of the payload are then voted
+    across all strips together, like ``decode_color_image`` does for the
+    whole image, whose results it returns.
+    """
+    check_wavelet(wavelet)
+    parameters = {
+        "coefficients": coefficients,
+        "block_size": block_size,
+        "level": level,
+        "wavelet": wavelet,
+        "ecc_symbols": ecc_symbols,
+        "precision": precision,
+        "workers": workers,
+    }
+    unit = block_size * 2**level
+    height, width = blocking.get_new_shape(image, unit)
+    _, coefficient_capacity = coder.get_capacity(
+        np.empty((height, width, 0)), **parameters
+    )
+    bit_count = coefficient_capacity * coder.BYTE
+
+    margins = []
+    blocks = 0
+    for rows in strip_rows(height, width, unit, tile_pixels):
+        if blocks >= bit_count:
+            break
+        channels = multichannel_coder.rgb_to_color_space(
+            np.ascontiguousarray(image[rows, :width]), color_space
+        )
+        margins.append(
+            coder.extract_margins(channels[:, :, use_channels], **parameters)
+        )
+        blocks += len(margins[-1])
+    margins = np.concatenate(margins)
+
+    soft_bits = coder.soft_payload(margins, coefficient_capacity)
+    message_raw = np.packbits(soft_bits > 0, axis=-1).tobytes()
+    period = None if ecc_length is None else ecc_length + 1
+    message, ecc_message = msg_utils.decode_soft_bits(soft_bits, ecc_symbols, period)
+    return message, ecc_message, message_raw
@@ -4,6 +4,8 @@ import cv2
 import numpy as np
 import pywt
 
+from stego.core import lifting
+
 
 def compute_image_difference(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
     img1, img2 = match_sizes(img1, img2)
@@ -11,14 +13,29 @@ def compute_image_difference(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
     return cv2.absdiff(img1, img2)
 
 
+def wavedecn(data: np.ndarray, wavelet: str, level: int | None = None, **kwargs):
+    """``pywt.wavedecn`` that also accepts the integer lifting Haar wavelet."""
+    if wavelet == lifting.WAVELET:
+        if level is None:
+            level = pywt.dwt_max_level(min(data.shape[:2]), 2)
+        return lifting.wavedecn(data, level, **kwargs)
+    return pywt.wavedecn(data, wavelet, level=level, **kwargs)
+
+
+def waverecn(coeffs: list, wavelet: str, **kwargs) -> np.ndarray:
+    """``pywt.waverecn`` that also accepts the integer lifting Haar wavelet."""
+    if wavelet == lifting.WAVELET:
+        return lifting.waverecn(coeffs, **kwargs)
+    return pywt.waverecn(coeffs, wavelet, **kwargs)
+
+
 def dwt_rgb_forward(img: np.ndarray, *args, **kwargs):
-    return [pywt.wavedecn(channel, *args, **kwargs) for channel in cv2.split(img)]
+    return [wavedecn(channel, *args, **kwargs) for channel in cv2.split(img)]
 
 
 def dwt_rgb_inverse(coefficients, *args, **kwargs):
     channels = [
-        pywt.waverecn(channel_coeffs, *args, **kwargs)
-        for channel_coeffs in coefficients
+        waverecn(channel_coeffs, *args, **kwargs) for channel_coeffs in coefficients
     ]
     return cv2.merge(channels)
 
@@ -8,6 +8,7 @@ from PySide6.QtWidgets import (
     QPushButton,
 )
 
+from stego.core import lifting
 from .color_channel import ColorChannel
 from .difference_viewer import DifferenceImageViewer
 from .multi_image_model import MultiImageModel
@@ -24,7 +25,9 @@ class ImageComparisonWidget(QWidget):
         self.level_selector.addItems([str(i) for i in range(5)])
         self.level_selector.setCurrentIndex(3)
         self.wavelet_selector = QComboBox()
-        self.wavelet_selector.addItems(pywt.wavelist(kind="discrete"))
+        self.wavelet_selector.addItems(
+            [lifting.WAVELET] + pywt.wavelist(kind="discrete")
+        )
         self.wavelet_selector.setCurrentText("haar")
         self.transform_button = QPushButton("Transform")
         self.transform_button.clicked.connect(self.on_transform_button_clicked)